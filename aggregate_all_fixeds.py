@@ -4,34 +4,51 @@ aggregate_all_fixeds.py
 Provides aggregate_fixeds(folder) which:
 - finds all files in `folder` containing '(修正)' and ending with .xls/.xlsx
 - reads each into a DataFrame, ensures the first column (日期) is normalized and cast to string
-- merges all tables on 日期 using outer join (dates as rows, other columns preserved with source prefixes)
+- outer-joins all tables on 日期 (dates as rows, other columns preserved with source prefixes)
 - writes the combined table to 總經指標_<YYYYMMDD>.xlsx in the same folder
+  (or .csv / .parquet with out_format='csv' / 'parquet')
 
 This is designed to be called from run_all_preprocess.py after preprocessors finish.
 """
 from typing import Optional
 import os, re
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
+from aggregate_preprocessed import read_excel_readonly, write_output
+
 DATE_RE = re.compile(r"^\d{4}-\d{2}$")
+# patterns used by normalize_date_str, compiled once at import
+_RE_YMD = re.compile(r'^(\d{4})[\-/.](\d{1,2})$')
+_RE_YYYYMM = re.compile(r'^(\d{6})$')
+_RE_YYYYMM_SPLIT = re.compile(r'^(\d{4})(\d{2})$')
+_RE_ROC = re.compile(r'^(\d{2,4})\s*[年\-/.](\d{1,2})')
+_RE_ANY = re.compile(r'(\d{4}).{0,2}(\d{1,2})')
 
 
 def safe_read_excel(path: str) -> Optional[pd.DataFrame]:
-    """Use pandas.read_excel (openpyxl engine) only; return None on failure.
+    """Read the first sheet of an Excel file as strings; return None on failure.
 
     Attempts:
-    1) pd.read_excel(..., sheet_name=0, engine='openpyxl', dtype=str)
-    2) pd.read_excel(..., sheet_name=None, engine='openpyxl', dtype=str) -> take first non-empty sheet
+    1) pd.read_excel(..., sheet_name=0, engine='calamine', dtype=str)
+    2) read_excel_readonly(..., sheet_name=0) (openpyxl read_only)
+    3) read_excel_readonly(..., sheet_name=None) -> take first non-empty sheet
+    calamine (python-calamine) is a Rust reader and much faster than openpyxl;
+    openpyxl is kept as fallback when calamine is not installed or fails.
     Logs exception messages to help diagnose files that pandas can't parse.
     """
     import traceback
     try:
-        return pd.read_excel(path, sheet_name=0, header=0, engine='openpyxl', dtype=str)
+        return pd.read_excel(path, sheet_name=0, header=0, engine='calamine', dtype=str)
+    except Exception as e:
+        print(f'pd.read_excel(engine=calamine) failed for {path}: {e}')
+    try:
+        return read_excel_readonly(path, sheet_name=0)
     except Exception as e:
-        print(f'pd.read_excel(sheet 0) failed for {path}: {e}')
+        print(f'openpyxl read (sheet 0) failed for {path}: {e}')
         # try reading all sheets and pick the first non-empty DataFrame
         try:
-            all_sheets = pd.read_excel(path, sheet_name=None, engine='openpyxl', dtype=str)
+            all_sheets = read_excel_readonly(path, sheet_name=None)
             for name, df in all_sheets.items():
                 if df is not None and df.shape[0] > 0 and df.shape[1] > 0:
                     print(f'using sheet "{name}" from {path}')
@@ -39,7 +56,7 @@ def safe_read_excel(path: str) -> Optional[pd.DataFrame]:
             print(f'no non-empty sheets found in {path}')
             return None
         except Exception as e2:
-            print(f'pd.read_excel(sheet=None) also failed for {path}: {e2}')
+            print(f'openpyxl read (sheet=None) also failed for {path}: {e2}')
             traceback.print_exc()
             return None
 
@@ -50,11 +67,10 @@ def ensure_date_string_firstcol(df: pd.DataFrame) -> pd.DataFrame:
         return df
     # promote numeric column names if needed
     first_col = df.columns[0]
-    # rename to 日期
-    df = df.copy()
+    # rename to 日期 in place; the frame was freshly read for this file, no need to copy it
     df.rename(columns={first_col: '日期'}, inplace=True)
     # coerce values to string
-    df['日期'] = df['日期'].astype(str).map(lambda x: x.strip() if x is not None else '')
+    df['日期'] = df['日期'].astype(str).str.strip()
     return df
 
 
@@ -73,22 +89,21 @@ def normalize_date_str(s: str) -> Optional[str]:
     if s == '':
         return None
     # direct YYYY-MM or YYYY/MM or YYYY.MM
-    import re
-    m = re.match(r'^(\d{4})[\-/.](\d{1,2})$', s)
+    m = _RE_YMD.match(s)
     if m:
         y = int(m.group(1))
         mo = int(m.group(2))
         if 1 <= mo <= 12:
             return f"{y:04d}-{mo:02d}"
     # compact YYYYMM
-    m = re.match(r'^(\d{6})$', s)
+    m = _RE_YYYYMM.match(s)
     if m:
         y = int(s[:4])
         mo = int(s[4:6])
         if 1 <= mo <= 12:
             return f"{y:04d}-{mo:02d}"
     # ROC like 110年07月 or 民國110年7月
-    m = re.match(r'^(\d{2,4})\s*[年\-/.](\d{1,2})', s)
+    m = _RE_ROC.match(s)
     if m:
         y = int(m.group(1))
         mo = int(m.group(2))
@@ -98,7 +113,7 @@ def normalize_date_str(s: str) -> Optional[str]:
         if 1 <= mo <= 12:
             return f"{y:04d}-{mo:02d}"
     # try to find year and month anywhere
-    m = re.search(r'(\d{4}).{0,2}(\d{1,2})', s)
+    m = _RE_ANY.search(s)
     if m:
         y = int(m.group(1))
         mo = int(m.group(2))
@@ -107,70 +122,118 @@ def normalize_date_str(s: str) -> Optional[str]:
     return None
 
 
-def aggregate_fixeds(folder: str) -> Optional[str]:
+def normalize_date_series(ser: pd.Series) -> pd.Series:
+    """Vectorized normalize_date_str over a whole Series.
+
+    The YYYY-MM / YYYYMM / ROC patterns are extracted with pandas string kernels;
+    rows none of them resolve (or with an invalid month) fall back to
+    normalize_date_str so results are identical to mapping it row by row.
+    """
+    s = ser.astype(str).str.strip().reset_index(drop=True)
+    out = pd.Series([None] * len(s), dtype=object)
+    # missing values keep the scalar function's handling
+    slow = s.isna()
+    todo = ~slow
+    for pat, roc in ((_RE_YMD, False), (_RE_YYYYMM_SPLIT, False), (_RE_ROC, True)):
+        if not todo.any():
+            break
+        ym = s[todo].str.extract(pat)
+        claimed = ym[0].notna()
+        y = pd.to_numeric(ym[0], errors='coerce')
+        mo = pd.to_numeric(ym[1], errors='coerce')
+        if roc:
+            # assume ROC if year < 1912
+            y = y.where(y >= 1912, y + 1911)
+        ok = claimed & y.notna() & mo.between(1, 12)
+        idx = ok[ok].index
+        if len(idx):
+            out[idx] = (y[idx].astype(int).astype(str).str.zfill(4) + '-'
+                        + mo[idx].astype(int).astype(str).str.zfill(2))
+        # anything a pattern matched but could not resolve takes the slow path
+        bad = claimed & ~ok
+        slow[bad[bad].index] = True
+        todo[claimed[claimed].index] = False
+    rest = slow | todo
+    if rest.any():
+        out[rest] = s[rest].map(normalize_date_str)
+    out.index = ser.index
+    return out
+
+
+def process_one(p: str) -> Optional[pd.DataFrame]:
+    """Read one (修正) file and return it grouped by normalized date with source-prefixed columns.
+
+    Returns None when the file cannot be read or has no usable rows.
+    """
+    print('reading', p)
+    df = safe_read_excel(p)
+    if df is None:
+        print('failed to read', p)
+        return None
+    df = ensure_date_string_firstcol(df)
+    if df is None or df.shape[0] == 0:
+        print('empty after read', p)
+        return None
+
+    # normalize date column and filter
+    df['norm_date'] = normalize_date_series(df['日期'])
+    # keep only rows with norm_date >= 2025-08 (i.e., 2025-08 and later)
+    df = df[df['norm_date'].notnull()]
+    df = df[df['norm_date'] >= '2025-08']
+    if df.shape[0] == 0:
+        print('no rows after date normalization/filter for', p)
+        return None
+
+    value_cols = [c for c in df.columns if c not in ('日期', 'norm_date')]
+    if not value_cols:
+        print('no value columns in', p)
+        return None
+
+    # group by normalized date, taking first non-empty value per column:
+    # blank / 'nan' / 'none' sentinels become NA so groupby.first() skips them
+    agg_cols = [c for c in df.columns if c != 'norm_date']
+    vals = df[agg_cols]
+    blank = vals.isna() | vals.apply(lambda c: c.astype(str).str.strip().str.lower().isin(('', 'nan', 'none')))
+    df = vals.mask(blank).assign(norm_date=df['norm_date'])
+    grouped = df.groupby('norm_date', as_index=False)[agg_cols].first()
+
+    # prefix columns with source name to avoid collisions (do not rename norm_date)
+    src = os.path.splitext(os.path.basename(p))[0]
+    rename_map = {c: f"{src}_{c}" for c in grouped.columns if c != 'norm_date'}
+    grouped.rename(columns=rename_map, inplace=True)
+    return grouped
+
+
+def aggregate_fixeds(folder: str, out_format: str = 'xlsx') -> Optional[str]:
     folder = os.fspath(folder)
     if not os.path.isdir(folder):
         print('folder not found:', folder)
         return None
 
-    files = [f for f in os.listdir(folder) if '(修正)' in f and f.lower().endswith(('.xls', '.xlsx'))]
+    with os.scandir(folder) as it:
+        files = [e.name for e in it
+                 if e.is_file() and '(修正)' in e.name and e.name.lower().endswith(('.xls', '.xlsx'))]
     if not files:
         print('no (修正) files found in', folder)
         return None
 
-    merged = None
-
-    def first_nonnull(s):
-        # return first non-empty, non-null value from series, else None
-        for v in s:
-            if pd.isna(v):
-                continue
-            vs = str(v).strip()
-            if vs == '' or vs.lower() in ('nan', 'none'):
-                continue
-            return v
+    paths = [os.path.join(folder, fn) for fn in sorted(files)]
+    # reading is dominated by zip/xml decoding in C extensions, so threads overlap well;
+    # ex.map keeps results in file order
+    if len(paths) <= 1:
+        results = [process_one(p) for p in paths]
+    else:
+        with ThreadPoolExecutor(max_workers=min(8, len(paths))) as ex:
+            results = list(ex.map(process_one, paths))
+
+    # outer-join all tables on norm_date in one pass; columns are already
+    # source-prefixed so they cannot collide
+    frames = [grouped.set_index('norm_date') for grouped in results if grouped is not None]
+    if not frames:
+        print('no tables loaded')
         return None
-
-    for fn in sorted(files):
-        p = os.path.join(folder, fn)
-        print('reading', p)
-        df = safe_read_excel(p)
-        if df is None:
-            print('failed to read', p)
-            continue
-        df = ensure_date_string_firstcol(df)
-        if df is None or df.shape[0] == 0:
-            print('empty after read', p)
-            continue
-
-        # normalize date column and filter
-        df['norm_date'] = df['日期'].map(lambda x: normalize_date_str(str(x)))
-        # keep only rows with norm_date >= 2025-08 (i.e., 2025-08 and later)
-        df = df[df['norm_date'].notnull()]
-        df = df[df['norm_date'] >= '2025-08']
-        if df.shape[0] == 0:
-            print('no rows after date normalization/filter for', p)
-            continue
-
-        value_cols = [c for c in df.columns if c not in ('日期', 'norm_date')]
-        if not value_cols:
-            print('no value columns in', p)
-            continue
-
-        # group by normalized date, taking first non-null per column
-        grouped = df.groupby('norm_date', as_index=False).agg(lambda s: first_nonnull(s))
-
-        # prefix columns with source name to avoid collisions (do not rename norm_date)
-        src = os.path.splitext(fn)[0]
-        rename_map = {c: f"{src}_{c}" for c in grouped.columns if c != 'norm_date'}
-        grouped.rename(columns=rename_map, inplace=True)
-
-        if merged is None:
-            merged = grouped
-        else:
-            merged = pd.merge(merged, grouped, on='norm_date', how='outer')
-
-    if merged is None or merged.shape[0] == 0:
+    merged = pd.concat(frames, axis=1, join='outer', sort=True).reset_index()
+    if merged.shape[0] == 0:
         print('no tables loaded')
         return None
 
@@ -182,7 +245,7 @@ def aggregate_fixeds(folder: str) -> Optional[str]:
     out_name = f'總經指標_{date_tag}.xlsx'
     out_path = os.path.join(folder, out_name)
     try:
-        merged.to_excel(out_path, index=False)
+        out_path = write_output(merged, out_path, out_format)
         print('wrote', out_path)
         return out_path
     except Exception as e:
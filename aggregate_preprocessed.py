@@ -2,7 +2,7 @@
 aggregate_preprocessed.py
 
 Usage:
-    python3 aggregate_preprocessed.py /path/to/YYYYMMDD
+    python3 aggregate_preprocessed.py /path/to/YYYYMMDD [xlsx|csv|parquet]
 
 This script finds all files in the given folder that contain '(修正)' in their
 filename and attempts to read them (Excel .xls/.xlsx). It then detects the
@@ -13,7 +13,7 @@ values match the pattern), melts each table into long form with columns:
 
 and writes the combined DataFrame to
 
-    總經指標彙整_<YYYYMMDD>.xlsx
+    總經指標彙整_<YYYYMMDD>.xlsx   (or .csv / .parquet when that format is given)
 
 If a file cannot be read, it is skipped with a printed warning.
 """
@@ -21,10 +21,27 @@ If a file cannot be read, it is skipped with a printed warning.
 import os
 import sys
 import re
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 import pandas as pd
 
+from preprocess_base import cell_to_str, openpyxl_row
+
 DATE_RE = re.compile(r"^\d{4}-\d{2}$")
+# rows per column inspected by detect_date_column
+DETECT_SAMPLE = 50
+# normalized match fraction at which detect_date_column stops scanning further columns
+DETECT_EARLY_EXIT = 0.9
+# patterns used by normalize_date_str and the layout heuristics, compiled once at import
+_RE_YMD = re.compile(r"^(\d{4})[\-/](\d{1,2})(?:[\-/]\d{1,2})?$")
+_RE_ROC_CN = re.compile(r"(\d{2,4})\s*年\s*(\d{1,2})\s*月")
+_RE_ROC = re.compile(r"^(\d{2,4})[\-/](\d{1,2})$")
+_RE_YM_NAME = re.compile(r"^\d{4}[\-/]\d{1,2}$")
+_RE_YM_PREFIX = re.compile(r"^\d{4}[\-/.]\d{1,2}")
+_RE_NON_DIGIT = re.compile(r"\D")
+_RE_MONTH_NUM = re.compile(r"^0*(?:[1-9]|1[0-2])$")
+_RE_MONTH_LABEL = re.compile(r"\d{1,2}月|年")
 
 
 def normalize_date_str(s: str) -> str:
@@ -45,18 +62,18 @@ def normalize_date_str(s: str) -> str:
     if DATE_RE.match(t):
         return t
     # match YYYY/MM or YYYY/MM/DD
-    m = re.match(r"^(\d{4})[\-/](\d{1,2})(?:[\-/]\d{1,2})?$", t)
+    m = _RE_YMD.match(t)
     if m:
         y = int(m.group(1)); mm = int(m.group(2))
         return f"{y:04d}-{mm:02d}"
     # match ROC '113年11月' or '113-11' etc
-    m2 = re.search(r"(\d{2,4})\s*年\s*(\d{1,2})\s*月", t)
+    m2 = _RE_ROC_CN.search(t)
     if m2:
         roc = int(m2.group(1)); mm = int(m2.group(2))
         ad = 1911 + roc
         return f"{ad:04d}-{mm:02d}"
     # match '113-11' (ROC-year dash month) heuristics: if year < 1900 assume ROC
-    m3 = re.match(r"^(\d{2,4})[\-/](\d{1,2})$", t)
+    m3 = _RE_ROC.match(t)
     if m3:
         y = int(m3.group(1)); mm = int(m3.group(2))
         if y < 1900:
@@ -65,17 +82,67 @@ def normalize_date_str(s: str) -> str:
     return t
 
 
-def detect_date_column(df: pd.DataFrame) -> Optional[str]:
+def normalize_date_series(ser: pd.Series) -> pd.Series:
+    """Vectorized normalize_date_str over a whole Series.
+
+    The YYYY/MM, ROC '年..月' and ROC 'YYY-MM' patterns are extracted with pandas
+    string kernels; unmatched rows fall back to normalize_date_str so results are
+    identical to mapping it row by row.
+    """
+    s = ser.astype(str).str.strip().reset_index(drop=True)
+    out = pd.Series([None] * len(s), dtype=object)
+    # missing values keep the scalar function's handling
+    slow = s.isna()
+    todo = ~slow
+    # (pattern, roc mode): 'add' always adds 1911, 'below1900' only for years < 1900
+    for pat, roc in ((_RE_YMD, None), (_RE_ROC_CN, 'add'), (_RE_ROC, 'below1900')):
+        if not todo.any():
+            break
+        ym = s[todo].str.extract(pat)
+        claimed = ym[0].notna()
+        y = pd.to_numeric(ym[0], errors='coerce')
+        mm = pd.to_numeric(ym[1], errors='coerce')
+        if roc == 'add':
+            y = y + 1911
+        elif roc == 'below1900':
+            y = y.where(y >= 1900, y + 1911)
+        ok = claimed & y.notna() & mm.notna()
+        idx = ok[ok].index
+        if len(idx):
+            out[idx] = (y[idx].astype(int).astype(str).str.zfill(4) + '-'
+                        + mm[idx].astype(int).astype(str).str.zfill(2))
+        bad = claimed & ~ok
+        slow[bad[bad].index] = True
+        todo[claimed[claimed].index] = False
+    # unmatched values are returned as the stripped original string
+    if todo.any():
+        out[todo] = s[todo]
+    if slow.any():
+        out[slow] = s[slow].map(normalize_date_str)
+    out.index = ser.index
+    return out
+
+
+def detect_date_column(df: pd.DataFrame, return_normalized: bool = False):
     """Return the column name that appears to be the date column (YYYY-MM).
     Preference order:
-      1) any column where >= 0.6 of non-null values match YYYY-MM
-      2) first column
+      1) first column where >= 0.6 of the sampled values already look like YYYY-MM
+      2) the column with the highest fraction (>= 0.6) of sampled values that normalize
+         to YYYY-MM; the first column reaching DETECT_EARLY_EXIT wins outright
+      3) column with most non-null values, else first column
+    Only the first DETECT_SAMPLE non-null values of each column are inspected.
+
+    With return_normalized=True a (column, normalized) tuple is returned, where
+    normalized holds the already normalized sampled values of that column (indexed
+    like df) or None when the column was chosen without normalizing it.
     """
+    def result(c, normed=None):
+        return (c, normed) if return_normalized else c
+
     cols = list(df.columns)
     if not cols:
-        return None
-    best = None
-    best_frac = 0.0
+        return result(None)
+    samples = []
     for c in cols:
         col = df[c]
         # if duplicate column names, df[c] may be a DataFrame; coerce to a single Series
@@ -87,27 +154,93 @@ def detect_date_column(df: pd.DataFrame) -> Optional[str]:
                 ser = col.stack().astype(str)
         else:
             ser = col.dropna().astype(str)
+        ser = ser.head(DETECT_SAMPLE)
         if ser.empty:
             continue
-        # try normalizing samples first
-        normed = ser.map(lambda x: normalize_date_str(x))
+        # cheap pre-screen on the raw strings before running the normalizer
+        if ser.str.match(_RE_YM_PREFIX).mean() >= 0.6:
+            return result(c)
+        samples.append((c, ser))
+    best = None
+    best_normed = None
+    best_frac = 0.0
+    for c, ser in samples:
+        normed = normalize_date_series(ser)
         matched = normed.str.match(DATE_RE)
         frac = matched.sum() / len(ser)
         if frac > best_frac:
             best_frac = frac
             best = c
+            best_normed = normed
+            # near-certain match: no need to normalize the remaining columns
+            if frac >= DETECT_EARLY_EXIT:
+                return result(best, best_normed)
     if best_frac >= 0.6:
-        return best
+        return result(best, best_normed)
     # fallback: choose column with most non-null values
     counts = {c: df[c].dropna().shape[0] for c in cols}
     sorted_cols = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)
     if sorted_cols and sorted_cols[0][1] > 0:
-        return sorted_cols[0][0]
-    return cols[0]
+        return result(sorted_cols[0][0])
+    return result(cols[0])
+
+
+def _rows_to_frame(rows, as_str: bool = True) -> pd.DataFrame:
+    """Build a DataFrame from openpyxl value rows, first row as header (like header=0)."""
+    rows = [list(r) for r in rows]
+    # openpyxl reports the used range; drop trailing empty rows like pandas does
+    while rows and all(v is None or v == '' for v in rows[-1]):
+        rows.pop()
+    if not rows:
+        return pd.DataFrame()
+    width = max(len(r) for r in rows)
+    rows = [r + [None] * (width - len(r)) for r in rows]
+    header = []
+    seen = {}
+    for i, h in enumerate(rows[0]):
+        name = f'Unnamed: {i}' if h is None or h == '' else str(h)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        header.append(name)
+    body = rows[1:]
+    if as_str:
+        body = [openpyxl_row(r, as_str=True) for r in body]
+    return pd.DataFrame(body, columns=header, dtype=object)
+
+
+def read_excel_readonly(path: str, sheet_name=0, as_str: bool = True):
+    """Read a sheet with openpyxl in read_only/data_only mode.
+
+    Read-only mode streams rows without building style or cell objects, which is
+    far faster than pd.read_excel(engine='openpyxl') on large workbooks.
+    sheet_name may be an index, a name, or None (returns {name: DataFrame} for all sheets).
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name is None:
+            return {ws.title: _rows_to_frame(ws.iter_rows(values_only=True), as_str) for ws in wb.worksheets}
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        return _rows_to_frame(ws.iter_rows(values_only=True), as_str)
+    finally:
+        # release the underlying zipfile handle
+        wb.close()
 
 
 def read_table(path: str) -> Optional[pd.DataFrame]:
-    """Try to read an excel file into DataFrame. Return None on failure."""
+    """Try to read an excel file into DataFrame. Return None on failure.
+
+    Prefers the calamine engine (python-calamine, Rust based) and falls back to
+    the pandas default engine, xlrd and openpyxl (read_only) in turn.
+    """
+    try:
+        df = pd.read_excel(path, sheet_name=0, header=0, engine='calamine')
+        return df
+    except Exception as e:
+        print(f"read with calamine failed for {path}: {e}")
     try:
         df = pd.read_excel(path, sheet_name=0, header=0)
         return df
@@ -119,11 +252,11 @@ def read_table(path: str) -> Optional[pd.DataFrame]:
             return df
         except Exception:
             try:
-                df = pd.read_excel(path, sheet_name=0, header=0, engine='openpyxl')
+                df = read_excel_readonly(path, sheet_name=0, as_str=False)
                 return df
             except Exception as e2:
                 print(f"fallback read failed for {path}: {e2}")
-                # final fallback: parse xlsx as zip/xml
+                # final fallback: read the raw first sheet without pandas' excel layer
                 df2 = read_xlsx_zip(path)
                 if df2 is not None:
                     return df2
@@ -131,9 +264,26 @@ def read_table(path: str) -> Optional[pd.DataFrame]:
 
 
 def read_xlsx_zip(path: str) -> Optional[pd.DataFrame]:
-    """Lightweight fallback: parse xlsx (zip) and return first worksheet as DataFrame.
-    This avoids openpyxl dependency by using ElementTree on the sheet xml.
+    """Lightweight fallback: return the first worksheet as a headerless DataFrame of strings.
+
+    Uses python_calamine.CalamineWorkbook directly when available; otherwise
+    parses the xlsx (zip) with ElementTree on the sheet xml.
     """
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        CalamineWorkbook = None
+    if CalamineWorkbook is not None:
+        try:
+            wb = CalamineWorkbook.from_path(path)
+            rows = wb.get_sheet_by_index(0).to_python()
+            maxc = max((len(r) for r in rows), default=0)
+            rows = [[cell_to_str(v) for v in r] + [''] * (maxc - len(r)) for r in rows]
+            return pd.DataFrame(rows)
+        except Exception as e:
+            print('calamine fallback failed for', path, e)
+            return None
+
     import zipfile
     import xml.etree.ElementTree as ET
     try:
@@ -185,193 +335,255 @@ def read_xlsx_zip(path: str) -> Optional[pd.DataFrame]:
         return None
 
 
-def aggregate_folder(folder: str) -> Optional[str]:
-    """Aggregate all '(修正)' files in folder into a long-form Excel file.
+def process_one(path: str) -> Optional[pd.DataFrame]:
+    """Read one (修正) file and return it melted to long form (日期, 資料來源, 欄位名稱, 數值).
 
-    Returns path to written file or None if nothing written.
+    Returns None when the file cannot be read or no date column is found.
     """
-    folder = os.fspath(folder)
-    if not os.path.isdir(folder):
-        print("folder not found:", folder)
-        return None
-
-    files = [f for f in os.listdir(folder) if '(修正)' in f and f.lower().endswith(('.xls', '.xlsx'))]
-    if not files:
-        print('no (修正) files found in', folder)
+    fn = os.path.basename(path)
+    print('reading', path)
+    df = read_table(path)
+    if df is None:
+        print('skipping', fn)
         return None
-
-    parts = []
-    for fn in sorted(files):
-        path = os.path.join(folder, fn)
-        print('reading', path)
-        df = read_table(path)
-        if df is None:
-            print('skipping', fn)
-            continue
-        # If read_xlsx_zip returned rows without header, scan the first few rows
-        # to find a candidate header row (many non-numeric or date-like cells)
-        try:
-            if all(isinstance(c, (int, float)) or str(c).isdigit() for c in df.columns):
-                header_row_idx = None
-                max_rows = min(6, len(df))
-                for r in range(0, max_rows):
-                    row = df.iloc[r].astype(str).str.strip().fillna('')
-                    if len(row) == 0:
-                        continue
-                    # count date-like cells after normalization
-                    date_like = 0
-                    text_like = 0
-                    for v in row:
-                        if not v:
-                            continue
-                        nv = normalize_date_str(v)
-                        if DATE_RE.match(nv):
-                            date_like += 1
-                        if re.search(r"\D", v):
-                            text_like += 1
-                    # prefer rows with many date-like cells or many text-like cells
-                    if len(row) > 0 and (date_like / len(row) >= 0.4 or text_like / len(row) >= 0.4):
-                        header_row_idx = r
-                        break
-                if header_row_idx is not None:
-                    hdr = df.iloc[header_row_idx].astype(str).str.strip().tolist()
-                    df = df[(header_row_idx + 1):].copy()
-                    df.columns = hdr
-                    df = df.reset_index(drop=True)
-        except Exception:
-            pass
-
-        # detect date column
-        date_col = detect_date_column(df)
-        # if detected date column is mostly empty, but many column NAMES look like dates,
-        # treat this sheet as 'columns are months' layout: transpose and re-detect
-        try:
-            non_null_dates = df[date_col].dropna().astype(str).str.strip()
-            non_null_frac = 0.0 if non_null_dates.empty else (non_null_dates.str.len() > 0).sum() / len(df)
-        except Exception:
-            non_null_frac = 0.0
-        colname_date_like = 0
-        for cn in df.columns:
-            if DATE_RE.match(str(cn).strip()) or re.match(r"^\d{4}[\-/]\d{1,2}$", str(cn).strip()):
-                colname_date_like += 1
-        # if date column is mostly empty and few column names look like dates,
-        # check if any early ROW looks like a month header (many cells 1..12)
-        month_row_idx = None
-        if non_null_frac < 0.1 and colname_date_like < 2:
+    # If read_xlsx_zip returned rows without header, scan the first few rows
+    # to find a candidate header row (many non-numeric or date-like cells)
+    try:
+        if all(isinstance(c, (int, float)) or str(c).isdigit() for c in df.columns):
+            header_row_idx = None
             max_rows = min(6, len(df))
             for r in range(0, max_rows):
                 row = df.iloc[r].astype(str).str.strip().fillna('')
-                if row.empty:
-                    continue
-                month_like = 0
-                total = 0
-                for v in row:
-                    if not v:
-                        continue
-                    total += 1
-                    mv = re.match(r"^0*(\d{1,2})$", v)
-                    if mv:
-                        iv = int(mv.group(1))
-                        if 1 <= iv <= 12:
-                            month_like += 1
-                if total and (month_like / total) >= 0.4 and month_like >= 3:
-                    month_row_idx = r
-                    break
-        if month_row_idx is not None:
-            # promote that row as header, then transpose so months become rows
-            hdr = df.iloc[month_row_idx].astype(str).str.strip().tolist()
-            df = df[(month_row_idx + 1):].copy()
-            df.columns = hdr
-            df = df.reset_index(drop=True)
-            df_t = df.copy()
-            df_t.columns = [str(x) for x in range(df_t.shape[1])]
-            df_t = df_t.T.reset_index(drop=True)
-            # promote first row as header if textual
-            hdr2 = df_t.iloc[0].astype(str).str.strip().tolist()
-            df_t = df_t[1:].copy()
-            df_t.columns = hdr2
-            df = df_t.reset_index(drop=True)
-            date_col = detect_date_column(df)
-        elif non_null_frac < 0.1 and colname_date_like >= 2:
-            # transpose: rows become columns; reset index
-            df_t = df.copy()
-            df_t.columns = [str(x) for x in range(df_t.shape[1])]
-            df_t = df_t.T.reset_index(drop=True)
-            # promote first row as header if looks like textual
-            hdr = df_t.iloc[0].astype(str).str.strip().tolist()
-            df_t = df_t[1:].copy()
-            df_t.columns = hdr
-            df = df_t.reset_index(drop=True)
-            date_col = detect_date_column(df)
-        else:
-            # attempt combining first 2 or 3 rows as a composite header then transpose
-            for combine_n in (2, 3):
-                if len(df) <= combine_n:
+                if len(row) == 0:
                     continue
-                rows = [df.iloc[i].astype(str).str.strip().fillna('') for i in range(combine_n)]
-                combined = []
-                for col_idx in range(df.shape[1]):
-                    parts = [rows[r].iat[col_idx] for r in range(combine_n) if rows[r].iat[col_idx]]
-                    combined.append(' '.join(parts))
-                # if many combined headers look like dates or month labels, use it
-                date_like = sum(1 for v in combined if DATE_RE.match(v) or re.search(r"\d{1,2}月|年", v))
-                if date_like >= 2:
-                    df2 = df[combine_n:].copy()
-                    df2.columns = combined
-                    df2 = df2.reset_index(drop=True)
-                    # transpose
-                    df_t = df2.copy()
-                    df_t.columns = [str(x) for x in range(df_t.shape[1])]
-                    df_t = df_t.T.reset_index(drop=True)
-                    hdr2 = df_t.iloc[0].astype(str).str.strip().tolist()
-                    df_t = df_t[1:].copy()
-                    df_t.columns = hdr2
-                    df = df_t.reset_index(drop=True)
-                    date_col = detect_date_column(df)
+                nonempty = row[row != '']
+                # count date-like cells after normalization
+                date_frac = normalize_date_series(nonempty).str.match(DATE_RE, na=False).sum() / len(row)
+                text_frac = nonempty.str.contains(_RE_NON_DIGIT, na=False).sum() / len(row)
+                # prefer rows with many date-like cells or many text-like cells
+                if date_frac >= 0.4 or text_frac >= 0.4:
+                    header_row_idx = r
                     break
-        if date_col is None:
-            print('no date column detected for', fn, '; skipping')
-            continue
+            if header_row_idx is not None:
+                hdr = df.iloc[header_row_idx].astype(str).str.strip().tolist()
+                df = df.iloc[(header_row_idx + 1):].reset_index(drop=True)
+                df.columns = hdr
+    except Exception:
+        pass
 
-        # melt other columns
-        value_vars = [c for c in df.columns if c != date_col]
-        if not value_vars:
-            print('no value columns for', fn, '; skipping')
-            continue
+    # detect date column
+    date_col, date_normed = detect_date_column(df, return_normalized=True)
+    # if detected date column is mostly empty, but many column NAMES look like dates,
+    # treat this sheet as 'columns are months' layout: transpose and re-detect
+    try:
+        non_null_dates = df[date_col].dropna().astype(str).str.strip()
+        non_null_frac = 0.0 if non_null_dates.empty else (non_null_dates.str.len() > 0).sum() / len(df)
+    except Exception:
+        non_null_frac = 0.0
+    colname_date_like = 0
+    for cn in df.columns:
+        if DATE_RE.match(str(cn).strip()) or _RE_YM_NAME.match(str(cn).strip()):
+            colname_date_like += 1
+    # if date column is mostly empty and few column names look like dates,
+    # check if any early ROW looks like a month header (many cells 1..12)
+    month_row_idx = None
+    if non_null_frac < 0.1 and colname_date_like < 2:
+        max_rows = min(6, len(df))
+        for r in range(0, max_rows):
+            row = df.iloc[r].astype(str).str.strip().fillna('')
+            nonempty = row[row != '']
+            total = len(nonempty)
+            month_like = int(nonempty.str.match(_RE_MONTH_NUM, na=False).sum())
+            if total and (month_like / total) >= 0.4 and month_like >= 3:
+                month_row_idx = r
+                break
+    if month_row_idx is not None:
+        # promote that row as header, then transpose so months become rows
+        hdr = df.iloc[month_row_idx].astype(str).str.strip().tolist()
+        df = df.iloc[(month_row_idx + 1):].reset_index(drop=True)
+        df.columns = hdr
+        # the transposed index is reset anyway, so no need to relabel columns first
+        df_t = df.T.reset_index(drop=True)
+        # promote first row as header if textual
+        hdr2 = df_t.iloc[0].astype(str).str.strip().tolist()
+        df = df_t.iloc[1:].reset_index(drop=True)
+        df.columns = hdr2
+        date_col, date_normed = detect_date_column(df, return_normalized=True)
+    elif non_null_frac < 0.1 and colname_date_like >= 2:
+        # transpose: rows become columns; reset index
+        df_t = df.T.reset_index(drop=True)
+        # promote first row as header if looks like textual
+        hdr = df_t.iloc[0].astype(str).str.strip().tolist()
+        df = df_t.iloc[1:].reset_index(drop=True)
+        df.columns = hdr
+        date_col, date_normed = detect_date_column(df, return_normalized=True)
+    else:
+        # attempt combining first 2 or 3 rows as a composite header then transpose
+        for combine_n in (2, 3):
+            if len(df) <= combine_n:
+                continue
+            rows = [df.iloc[i].astype(str).str.strip().fillna('') for i in range(combine_n)]
+            combined = []
+            for col_idx in range(df.shape[1]):
+                hdr_parts = [rows[r].iat[col_idx] for r in range(combine_n) if rows[r].iat[col_idx]]
+                combined.append(' '.join(hdr_parts))
+            # if many combined headers look like dates or month labels, use it
+            date_like = sum(1 for v in combined if DATE_RE.match(v) or _RE_MONTH_LABEL.search(v))
+            if date_like >= 2:
+                # the header rows are dropped and the rest transposed directly
+                df_t = df.iloc[combine_n:].T.reset_index(drop=True)
+                hdr2 = df_t.iloc[0].astype(str).str.strip().tolist()
+                df = df_t.iloc[1:].reset_index(drop=True)
+                df.columns = hdr2
+                date_col, date_normed = detect_date_column(df, return_normalized=True)
+                break
+    if date_col is None:
+        print('no date column detected for', fn, '; skipping')
+        return None
 
-        melt = df[[date_col] + value_vars].copy()
-        # normalize date column to YYYY-MM strings (attempt to parse if necessary)
-        melt = melt.reset_index(drop=True)
-        # coerce date values into a new '日期' column (string)
-        melt['日期'] = melt[date_col].astype(str).map(lambda x: normalize_date_str(x))
-        # ensure value_vars are strings and unique
-        safe_value_vars = [str(c) for c in value_vars]
-        # create source column
-        src = os.path.splitext(fn)[0]
-        # melt using the explicit '日期' column
-        long = melt.melt(id_vars=['日期'], value_vars=safe_value_vars, var_name='欄位名稱', value_name='數值')
-        long.insert(1, '資料來源', src)
-        parts.append(long)
-
-    if not parts:
-        print('no data collected')
+    # melt other columns
+    value_vars = [c for c in df.columns if c != date_col]
+    if not value_vars:
+        print('no value columns for', fn, '; skipping')
         return None
 
-    combined = pd.concat(parts, ignore_index=True, sort=False)
-    # optional: drop rows where 數值 is null or empty string? keep for now
-    # write to excel
+    # normalize date column to YYYY-MM strings (attempt to parse if necessary);
+    # rows already normalized while detecting the column are reused
+    melt = df[[date_col] + value_vars]
+    dates = pd.Series(None, index=melt.index, dtype=object)
+    if date_normed is not None and date_normed.index.isin(melt.index).all():
+        dates.loc[date_normed.index] = date_normed
+    rest = dates.isna()
+    if rest.any():
+        dates[rest] = normalize_date_series(melt.loc[rest, date_col])
+    melt = melt.reset_index(drop=True)
+    # coerce date values into a new '日期' column (string)
+    melt['日期'] = dates.reset_index(drop=True)
+    # ensure value_vars are strings and unique
+    safe_value_vars = [str(c) for c in value_vars]
+    # create source column
+    src = os.path.splitext(fn)[0]
+    # melt using the explicit '日期' column
+    long = melt.melt(id_vars=['日期'], value_vars=safe_value_vars, var_name='欄位名稱', value_name='數值')
+    long.insert(1, '資料來源', src)
+    return long
+
+
+def write_xlsx(df: pd.DataFrame, out_path: str) -> None:
+    """Write df to out_path as a single-sheet xlsx (no index).
+
+    Streams rows through xlsxwriter in constant_memory mode so memory stays at
+    one row; pandas' to_excel emits cells column by column, which
+    constant_memory cannot handle, hence write_row here. Falls back to
+    DataFrame.to_excel when xlsxwriter is not installed.
+    """
+    write_xlsx_parts([df], out_path)
+
+
+def write_xlsx_parts(parts, out_path: str) -> None:
+    """Write an iterable of same-column DataFrames one after another as a single sheet.
+
+    Each part is released once its rows are written, so a combined frame of
+    all parts never exists (except in the to_excel fallback).
+    """
+    parts = iter(parts)
+    try:
+        import xlsxwriter
+    except ImportError:
+        pd.concat(parts, ignore_index=True, sort=False).to_excel(out_path, index=False)
+        return
+    wb = xlsxwriter.Workbook(out_path, {'constant_memory': True, 'strings_to_numbers': False,
+                                       'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    try:
+        ws = wb.add_worksheet('Sheet1')
+        r = 0
+        for df in parts:
+            if r == 0:
+                ws.write_row(0, 0, [str(c) for c in df.columns])
+                r = 1
+            for row in df.itertuples(index=False, name=None):
+                ws.write_row(r, 0, [None if pd.isna(v) else v for v in row])
+                r += 1
+    finally:
+        wb.close()
+
+
+OUT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+
+def write_output(df: pd.DataFrame, out_path: str, out_format: str = 'xlsx') -> str:
+    """Write df as xlsx, csv or parquet and return the path actually written.
+
+    out_path is the .xlsx path; csv/parquet swap the extension. csv and parquet
+    are much cheaper to produce than xlsx when the consumer is another script.
+    """
+    if out_format not in OUT_FORMATS:
+        raise ValueError(f'out_format must be one of {OUT_FORMATS}, got {out_format!r}')
+    base = os.path.splitext(out_path)[0]
+    if out_format == 'parquet':
+        out_path = base + '.parquet'
+        # mixed str/number object columns cannot be stored by pyarrow; keep them as strings
+        obj_cols = {c: 'string' for c in df.columns[df.dtypes == object]}
+        df.astype(obj_cols).to_parquet(out_path, engine='pyarrow', compression='zstd', index=False)
+    elif out_format == 'csv':
+        out_path = base + '.csv'
+        df.to_csv(out_path, index=False)
+    else:
+        write_xlsx(df, out_path)
+    return out_path
+
+
+def aggregate_folder(folder: str, out_format: str = 'xlsx') -> Optional[str]:
+    """Aggregate all '(修正)' files in folder into a long-form Excel (or csv/parquet) file.
+
+    Returns path to written file or None if nothing written.
+    """
+    folder = os.fspath(folder)
+    if not os.path.isdir(folder):
+        print("folder not found:", folder)
+        return None
+
+    with os.scandir(folder) as it:
+        files = [e.name for e in it
+                 if e.is_file() and '(修正)' in e.name and e.name.lower().endswith(('.xls', '.xlsx'))]
+    if not files:
+        print('no (修正) files found in', folder)
+        return None
+
+    paths = [os.path.join(folder, fn) for fn in sorted(files)]
     date_tag = os.path.basename(folder.rstrip(os.sep))
     out_name = f'總經指標彙整_{date_tag}.xlsx'
     out_path = os.path.join(folder, out_name)
+    # reading is dominated by zip/xml decoding in C extensions, so threads overlap well;
+    # ex.map keeps results in file order and hands each one over as soon as it is consumed
+    ex = ThreadPoolExecutor(max_workers=min(8, len(paths))) if len(paths) > 1 else None
     try:
-        combined.to_excel(out_path, index=False)
-        print('wrote', out_path)
-        return out_path
-    except Exception as e:
-        print('write failed:', e)
-        return None
+        results = ex.map(process_one, paths) if ex is not None else map(process_one, paths)
+        parts = (long for long in results if long is not None)
+        first = next(parts, None)
+        if first is None:
+            print('no data collected')
+            return None
+        parts = itertools.chain([first], parts)
+        del first
+        # optional: drop rows where 數值 is null or empty string? keep for now
+        try:
+            if out_format == 'xlsx':
+                # stream each file's rows straight into the sheet instead of concatenating first
+                write_xlsx_parts(parts, out_path)
+            else:
+                out_path = write_output(pd.concat(parts, ignore_index=True, sort=False), out_path, out_format)
+            print('wrote', out_path)
+            return out_path
+        except Exception as e:
+            print('write failed:', e)
+            return None
+    finally:
+        if ex is not None:
+            ex.shutdown()
 
 
 if __name__ == '__main__':
     folder = sys.argv[1] if len(sys.argv) > 1 else '.'
-    aggregate_folder(folder)
+    out_format = sys.argv[2] if len(sys.argv) > 2 else 'xlsx'
+    aggregate_folder(folder, out_format=out_format)
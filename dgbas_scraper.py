@@ -1,76 +1,100 @@
 from playwright.sync_api import sync_playwright
 import os
-from datetime import datetime
 import time
 
+from scraper_base import BLOCKED_RESOURCE_TYPES, RunContext, asset_blocker, move_download
+
 DEFAULT_WAIT = 60
+URL = 'https://nstatdb.dgbas.gov.tw/dgbasAll/webMain.aspx?sys=210&funid=A030502015'
+
+block_assets = asset_blocker(BLOCKED_RESOURCE_TYPES)
+
 
 def sanitize(s: str) -> str:
     return ''.join(c for c in s if c.isalnum() or c in ' _-.').strip()
 
-def run(output_dir='.', keep_browser_open=False):
+
+def _do_work(page, out_folder, target_name):
+    """Select cycle/outmode on an open page and download the file into out_folder."""
+    page.goto(URL)
+    # wait for the form we need rather than networkidle (analytics beacons keep the network busy)
+    page.wait_for_selector('select[name="cycle"]', state='attached', timeout=15000)
+
+    # select cycle=1
+    sel_cycle = page.query_selector('select[name="cycle"]')
+    if sel_cycle:
+        try:
+            sel_cycle.select_option(value='1')
+        except Exception:
+            # fallback: evaluate
+            page.evaluate("() => { const s=document.querySelector('select[name=\\\"cycle\\\"]'); if(s) s.value='1'; }")
+
+    # select outmode=1
+    sel_out = page.query_selector('select[name="outmode"]')
+    if sel_out:
+        try:
+            sel_out.select_option(value='1')
+        except Exception:
+            page.evaluate("() => { const s=document.querySelector('select[name=\\\"outmode\\\"]'); if(s) s.value='1'; }")
+
+    # click the button (type=button). There might be multiple; prefer visible one.
+    btn = None
+    for e in page.query_selector_all('input[type="button"], button[type="button"]'):
+        # choose the first visible enabled
+        try:
+            visible = e.is_visible()
+        except Exception:
+            visible = True
+        if visible:
+            btn = e
+            break
+
+    if not btn:
+        # last resort, try to find by value/text
+        btn = page.query_selector('input[type="button"]')
+
+    if btn:
+        with page.expect_download(timeout=30000) as dr:
+            try:
+                btn.click()
+            except Exception:
+                page.evaluate('e => e.click()', btn)
+        download = dr.value
+        # determine extension from suggested filename
+        suggested = download.suggested_filename or 'download'
+        ext = os.path.splitext(suggested)[1] or ''
+        dest = os.path.join(out_folder, sanitize(target_name) + ext)
+        move_download(download, dest)
+        print('downloaded', dest)
+    else:
+        print('button not found; no download performed')
+
+
+def run(output_dir='.', keep_browser_open=False, page=None, context=None):
     """Scrape DGBAS A030502015 and download file as 營造工程物價指數_YYYYMMDD in ./YYYYMMDD/"""
-    URL = 'https://nstatdb.dgbas.gov.tw/dgbasAll/webMain.aspx?sys=210&funid=A030502015'
-    date_tag = datetime.now().strftime('%Y%m%d')
-    out_folder = os.path.join(output_dir, date_tag)
-    os.makedirs(out_folder, exist_ok=True)
+    run_ctx = RunContext.create(output_dir)
+    date_tag, out_folder = run_ctx.date_tag, run_ctx.out_folder
     target_name = f'營造工程物價指數_{date_tag}'
 
+    if page is not None or context is not None:
+        # reuse a browser owned by the caller (e.g. run_all_scrapers)
+        own_page = page is None
+        if own_page:
+            context.route('**/*', block_assets)
+            page = context.new_page()
+        try:
+            _do_work(page, out_folder, target_name)
+        finally:
+            if own_page:
+                page.close()
+        return
+
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=not keep_browser_open)
         context = browser.new_context(accept_downloads=True)
+        context.route('**/*', block_assets)
         page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # select cycle=1
-        sel_cycle = page.query_selector('select[name="cycle"]')
-        if sel_cycle:
-            try:
-                sel_cycle.select_option(value='1')
-            except Exception:
-                # fallback: evaluate
-                page.evaluate("() => { const s=document.querySelector('select[name=\\\"cycle\\\"]'); if(s) s.value='1'; }")
-
-        # select outmode=1
-        sel_out = page.query_selector('select[name="outmode"]')
-        if sel_out:
-            try:
-                sel_out.select_option(value='1')
-            except Exception:
-                page.evaluate("() => { const s=document.querySelector('select[name=\\\"outmode\\\"]'); if(s) s.value='1'; }")
-
-        # click the button (type=button). There might be multiple; prefer visible one.
-        btn = None
-        for e in page.query_selector_all('input[type="button"], button[type="button"]'):
-            # choose the first visible enabled
-            try:
-                visible = e.is_visible()
-            except Exception:
-                visible = True
-            if visible:
-                btn = e
-                break
-
-        if not btn:
-            # last resort, try to find by value/text
-            btn = page.query_selector('input[type="button"]')
-
-        if btn:
-            with page.expect_download(timeout=30000) as dr:
-                try:
-                    btn.click()
-                except Exception:
-                    page.evaluate('e => e.click()', btn)
-            download = dr.value
-            # determine extension from suggested filename
-            suggested = download.suggested_filename or 'download'
-            ext = os.path.splitext(suggested)[1] or ''
-            dest = os.path.join(out_folder, sanitize(target_name) + ext)
-            download.save_as(dest)
-            print('downloaded', dest)
-        else:
-            print('button not found; no download performed')
+        _do_work(page, out_folder, target_name)
 
         if not keep_browser_open:
             context.close()
@@ -1,116 +1,162 @@
 from playwright.sync_api import sync_playwright
 import os
-from datetime import datetime
 import pickle
+import re
 import time
+import pandas as pd
+
+from scraper_base import BLOCKED_RESOURCE_TYPES, RunContext, asset_blocker
 
 DEFAULT_WAIT = 60
+URL = 'https://service.moea.gov.tw/EE520/investigate/InvestigateBA.aspx'
+# thousands-separated numbers such as 1,234,567.8
+_NUM_RE = re.compile(r'^[0-9]{1,3}(?:,[0-9]{3})+(?:\.?[0-9]+)?$')
+
+block_assets = asset_blocker(BLOCKED_RESOURCE_TYPES)
+
 
 def sanitize(s: str) -> str:
     # allow dots, spaces, underscores, hyphens and chinese chars
     return ''.join(c for c in s if c.isalnum() or c in ' _-./\u4e00-\u9fff').strip()
 
+# returns {thead: [[cell text]], tbody: [[cell text]]} for the result table, or null
+_TABLE_JS = """(sel) => {
+    const tbl = document.querySelector(sel);
+    if (!tbl) return null;
+    const rows = (part) => {
+        const sec = tbl.querySelector(part);
+        if (!sec) return [];
+        return [...sec.querySelectorAll('tr')]
+            .map(tr => [...tr.querySelectorAll('th,td')].map(c => c.innerText.trim()));
+    };
+    return { thead: rows('thead'), tbody: rows('tbody') };
+}"""
+
+
+def _clean_cell(txt):
+    if _NUM_RE.match(txt):
+        txt = txt.replace(',', '')
+    return txt
+
+
 def parse_table(page):
-    # locate the table by id
-    tbl = page.query_selector('#divTableReport #ContentPlaceHolder1_tabResult')
-    if not tbl:
+    # pull the whole table in one evaluate call instead of one inner_text() per cell
+    raw = page.evaluate(_TABLE_JS, '#divTableReport #ContentPlaceHolder1_tabResult')
+    if not raw:
         return None
 
     result = {'thead': [], 'tbody': []}
-
-    thead = tbl.query_selector('thead')
-    if thead:
-        for tr in thead.query_selector_all('tr'):
-            row = []
-            for td in tr.query_selector_all('th,td'):
-                txt = td.inner_text().strip()
-                if __import__('re').match(r'^[0-9]{1,3}(?:,[0-9]{3})+(?:\.?[0-9]+)?$', txt):
-                    txt = txt.replace(',', '')
-                row.append(txt)
-            if row:
-                result['thead'].append(','.join(row))
-
-    tbody = tbl.query_selector('tbody')
-    if tbody:
-        for tr in tbody.query_selector_all('tr'):
-            cells = []
-            for cell in tr.query_selector_all('th,td'):
-                txt = cell.inner_text().strip()
-                if __import__('re').match(r'^[0-9]{1,3}(?:,[0-9]{3})+(?:\.?[0-9]+)?$', txt):
-                    txt = txt.replace(',', '')
-                cells.append(txt)
+    for part in ('thead', 'tbody'):
+        for cells in raw[part]:
             if cells:
-                result['tbody'].append(','.join(cells))
+                result[part].append(','.join(_clean_cell(c) for c in cells))
 
     return result
 
-def run(output_dir='.', keep_browser_open=False):
-    """Scrape EE520 外銷訂單 and save as 外銷訂單_YYYYMMDD.pickle under ./YYYYMMDD/"""
-    URL = 'https://service.moea.gov.tw/EE520/investigate/InvestigateBA.aspx'
-    date_tag = datetime.now().strftime('%Y%m%d')
-    out_folder = os.path.join(output_dir, date_tag)
-    os.makedirs(out_folder, exist_ok=True)
+def save_parsed(parsed, dest_base, legacy_pickle=False):
+    """Save parse_table() output as <dest_base>.parquet (or .pickle when legacy_pickle).
+
+    The parquet file has one row per table row: section ('thead'/'tbody') and
+    line (the comma-joined cell texts), so preprocess_ee520 can rebuild the dict.
+    """
+    if legacy_pickle:
+        dest = dest_base + '.pickle'
+        with open(dest, 'wb') as f:
+            pickle.dump(parsed, f)
+        return dest
+    dest = dest_base + '.parquet'
+    sections = ['thead'] * len(parsed['thead']) + ['tbody'] * len(parsed['tbody'])
+    df = pd.DataFrame({'section': sections, 'line': parsed['thead'] + parsed['tbody']})
+    df.to_parquet(dest, compression='zstd', index=False)
+    return dest
+
+
+def _do_work(page, out_folder, target_name, legacy_pickle=False):
+    """Tick the EE520 items on an open page, submit and save the parsed table into out_folder."""
+    page.goto(URL)
+    # wait for the item tree rather than networkidle (analytics beacons keep the network busy)
+    page.wait_for_selector('div#ContentPlaceHolder1_tvItem1 input[type="checkbox"]', state='attached', timeout=DEFAULT_WAIT*1000)
+
+    # step 3.1 checkbox in div#ContentPlaceHolder1_tvItem1 name=ContentPlaceHolder1_tvItem1n0CheckBox
+    try:
+        cb1 = page.query_selector('div#ContentPlaceHolder1_tvItem1 input[type="checkbox"][name="ContentPlaceHolder1_tvItem1n0CheckBox"]')
+        if cb1 and not cb1.is_checked():
+            cb1.check()
+    except Exception:
+        pass
+
+    # step 3.2 checkbox in div#ContentPlaceHolder1_tvItem2 name=ContentPlaceHolder1_tvItem2n1CheckBox
+    try:
+        cb2 = page.query_selector('div#ContentPlaceHolder1_tvItem2 input[type="checkbox"][name="ContentPlaceHolder1_tvItem2n1CheckBox"]')
+        if cb2 and not cb2.is_checked():
+            cb2.check()
+    except Exception:
+        pass
+
+    # step 3.3 checkbox in div#ContentPlaceHolder1_divItem3 name=ContentPlaceHolder1_tvItem3n0CheckBox
+    try:
+        cb3 = page.query_selector('div#ContentPlaceHolder1_divItem3 input[type="checkbox"][name="ContentPlaceHolder1_tvItem3n0CheckBox"]')
+        if cb3 and not cb3.is_checked():
+            cb3.check()
+    except Exception:
+        pass
+
+    # step 3.4 click submit input[type=submit]
+    try:
+        submit = page.query_selector('input[type="submit"]')
+        if submit:
+            submit.click()
+        else:
+            # try button element
+            btn = page.query_selector('button[type="submit"]')
+            if btn:
+                btn.click()
+    except Exception:
+        # fallback: evaluate a click on first submit
+        page.evaluate("() => { const e=document.querySelector('input[type=\\\"submit\\\"]'); if(e) e.click(); }")
+
+    # wait for results area
+    try:
+        page.wait_for_selector('#divTableReport #ContentPlaceHolder1_tabResult', timeout=DEFAULT_WAIT*1000)
+    except Exception:
+        time.sleep(3)
+
+    parsed = parse_table(page)
+    if parsed is None:
+        print('table not found')
+    else:
+        dest = save_parsed(parsed, os.path.join(out_folder, sanitize(target_name)), legacy_pickle)
+        print('saved', dest)
+
+
+def run(output_dir='.', keep_browser_open=False, page=None, context=None, legacy_pickle=False):
+    """Scrape EE520 外銷訂單 and save as 外銷訂單_YYYYMMDD.parquet under ./YYYYMMDD/
+
+    legacy_pickle=True writes the previous 外銷訂單_YYYYMMDD.pickle instead.
+    """
+    run_ctx = RunContext.create(output_dir)
+    date_tag, out_folder = run_ctx.date_tag, run_ctx.out_folder
     target_name = f'外銷訂單_{date_tag}'
 
+    if page is not None or context is not None:
+        # reuse a browser owned by the caller (e.g. run_all_scrapers)
+        own_page = page is None
+        if own_page:
+            context.route('**/*', block_assets)
+            page = context.new_page()
+        try:
+            _do_work(page, out_folder, target_name, legacy_pickle)
+        finally:
+            if own_page:
+                page.close()
+        return
+
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=not keep_browser_open)
         context = browser.new_context()
+        context.route('**/*', block_assets)
         page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # step 3.1 checkbox in div#ContentPlaceHolder1_tvItem1 name=ContentPlaceHolder1_tvItem1n0CheckBox
-        try:
-            cb1 = page.query_selector('div#ContentPlaceHolder1_tvItem1 input[type="checkbox"][name="ContentPlaceHolder1_tvItem1n0CheckBox"]')
-            if cb1 and not cb1.is_checked():
-                cb1.check()
-        except Exception:
-            pass
-
-        # step 3.2 checkbox in div#ContentPlaceHolder1_tvItem2 name=ContentPlaceHolder1_tvItem2n1CheckBox
-        try:
-            cb2 = page.query_selector('div#ContentPlaceHolder1_tvItem2 input[type="checkbox"][name="ContentPlaceHolder1_tvItem2n1CheckBox"]')
-            if cb2 and not cb2.is_checked():
-                cb2.check()
-        except Exception:
-            pass
-
-        # step 3.3 checkbox in div#ContentPlaceHolder1_divItem3 name=ContentPlaceHolder1_tvItem3n0CheckBox
-        try:
-            cb3 = page.query_selector('div#ContentPlaceHolder1_divItem3 input[type="checkbox"][name="ContentPlaceHolder1_tvItem3n0CheckBox"]')
-            if cb3 and not cb3.is_checked():
-                cb3.check()
-        except Exception:
-            pass
-
-        # step 3.4 click submit input[type=submit]
-        try:
-            submit = page.query_selector('input[type="submit"]')
-            if submit:
-                submit.click()
-            else:
-                # try button element
-                btn = page.query_selector('button[type="submit"]')
-                if btn:
-                    btn.click()
-        except Exception:
-            # fallback: evaluate a click on first submit
-            page.evaluate("() => { const e=document.querySelector('input[type=\\\"submit\\\"]'); if(e) e.click(); }")
-
-        # wait for results area
-        try:
-            page.wait_for_selector('#divTableReport #ContentPlaceHolder1_tabResult', timeout=DEFAULT_WAIT*1000)
-        except Exception:
-            time.sleep(3)
-
-        parsed = parse_table(page)
-        if parsed is None:
-            print('table not found')
-        else:
-            dest = os.path.join(out_folder, sanitize(target_name) + '.pickle')
-            with open(dest, 'wb') as f:
-                pickle.dump(parsed, f)
-            print('saved', dest)
+        _do_work(page, out_folder, target_name, legacy_pickle)
 
         if not keep_browser_open:
             context.close()
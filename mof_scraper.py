@@ -1,412 +1,181 @@
-from playwright.sync_api import sync_playwright
 from datetime import datetime
 import os
 import re
 import time
 import logging
 
+from scraper_base import DEFAULT_WAIT_MS, make_run_async, run_standalone, save_download
+
 # module logger
 logger = logging.getLogger(__name__)
 
 URL = 'https://web02.mof.gov.tw/njswww/WebMain.aspx?sys=100&funid=defjsptgl'
-DEFAULT_WAIT = 60
-
-
-def run(output_dir='.', keep_browser_open=True):
-    # ensure dated output folder exists under provided output_dir
-    date_tag = datetime.now().strftime('%Y%m%d')
-    # if the provided output_dir already ends with the date_tag, use it directly
-    if os.path.basename(os.path.abspath(output_dir)) == date_tag:
-        out_folder = output_dir
-    else:
-        out_folder = os.path.join(output_dir, date_tag)
-    os.makedirs(out_folder, exist_ok=True)
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # helper: try to find a selector in page or any child frame, return (element, owner)
-        def find_element(root, selector, timeout=DEFAULT_WAIT):
-            # try root (Page or Frame) first
+# scripts stay enabled: the nested query frames are built by JS
+# images are kept: the tree is expanded by clicking an <img> node icon, which needs a rendered box to be clickable
+BLOCKED_RESOURCE_TYPES = ('font', 'stylesheet', 'media')
+# for elements that are already loaded when we act on them (the 出口 link, the USD box);
+# no point waiting the full DEFAULT_WAIT_MS for them
+QUICK_ACTION_TIMEOUT_MS = 5000
+# clicks every unchecked checkbox under each table matching the given selectors; the
+# checked-state read and the click happen in the page, one evaluate for all tables.
+# returns per selector how many were clicked, or -1 when the table is not there (yet)
+_CHECK_ALL_JS = """(sels) => sels.map(sel => {
+    const tbl = document.querySelector(sel);
+    if (!tbl) return -1;
+    let n = 0;
+    tbl.querySelectorAll('input[type=checkbox]').forEach(cb => {
+        if (!cb.checked) { cb.click(); n++; }
+    });
+    return n;
+})"""
+
+
+async def _do_work(page, run_ctx):
+    """Walk the MOF trade-statistics frames, tick the machinery export items and download the result."""
+    # the page is a frameset: 'load' fires once the child frames have loaded, which is
+    # all the frame lookup below needs, without networkidle's wait for polling XHRs
+    await page.goto(URL, wait_until='load')
+
+    # the query frame is identified by name/src from Playwright's client-side frame tree,
+    # so looking for it costs no round trip (unlike evaluating document.title per frame)
+    def is_query_frame(fr):
+        return fr.name == 'qry2' or 'i7000' in (fr.url or '')
+
+    # click the folder9 '出口' link inside frame title='功能清單', then switch to frame title='查詢內容' for subsequent actions
+    try:
+        start_t = time.time()
+        clicked = False
+        # function-list frame (title 貿易統計資料查詢), identified by its src
+        func_frame = next((fr for fr in page.frames if 'defjsp7' in (fr.url or '')), None)
+
+        # click() resolves the locator itself; a short timeout stands in for the old
+        # count() > 0 probe, which cost an extra round trip per attempt
+        if func_frame:
             try:
-                el = root.wait_for_selector(selector, timeout=timeout)
-                if el:
-                    return el, root
+                await func_frame.locator('#folder9 >> text=出口').first.click(timeout=QUICK_ACTION_TIMEOUT_MS)
+                clicked = True
             except Exception:
                 pass
 
-            # then try child frames of root
+        if not clicked:
             try:
-                frames = root.frames
+                await page.locator('text=出口').first.click(timeout=QUICK_ACTION_TIMEOUT_MS)
+                clicked = True
             except Exception:
-                frames = []
-            for fr in frames:
-                try:
-                    el = fr.wait_for_selector(selector, timeout=timeout)
-                    if el:
-                        return el, fr
-                except Exception:
-                    continue
-            return None, None
-
-        # helper: get labels from page or frames
-        def get_labels():
-            labs = page.query_selector_all('label') or []
-            if labs:
-                return labs
-            for fr in page.frames:
-                try:
-                    labs = fr.query_selector_all('label')
-                    if labs:
-                        return labs
-                except Exception:
-                    continue
-            return []
-
-        # helper: find a frame by document.title within a timeout
-        def get_frame_by_title(page_obj, expected_title, timeout=2.0):
-            end = time.time() + timeout
-            while time.time() < end:
-                for fr in page_obj.frames:
-                    try:
-                        t = fr.evaluate('() => document.title')
-                        if t and expected_title in t:
-                            return fr
-                    except Exception:
-                        continue
-                time.sleep(0.1)
-            return None
-
-        # click the folder9 '出口' link inside frame title='功能清單', then switch to frame title='查詢內容' for subsequent actions
-        try:
-            start_t = time.time()
-            clicked = False
-            func_frame = None
-            for fr in page.frames:
-                try:
-                    t = fr.evaluate('() => document.title')
-                    if t and '貿易統計資料查詢' in t:
-                        func_frame = fr
-                        break
-                except Exception:
-                    continue
-
-            if not func_frame:
-                for fr in page.frames:
-                    try:
-                        if 'defjsp7' in fr.url:
-                            func_frame = fr
-                            break
-                    except Exception:
-                        continue
-
-            if func_frame:
-                try:
-                    loc = func_frame.locator('#folder9 >> text=出口')
-                    if loc.count() > 0:
-                        loc.first.click()
-                        clicked = True
-                except Exception:
-                    pass
-
-            if not clicked:
-                try:
-                    loc2 = page.locator('text=出口')
-                    if loc2.count() > 0:
-                        loc2.first.click()
-                        clicked = True
-                except Exception:
-                    pass
-
-            elapsed = time.time() - start_t
-            logger.debug('folder9 click elapsed=%.2fs, clicked=%s', elapsed, clicked)
-
-            if not clicked:
-                logger.debug('folder9/出口 not found or not clickable')
-            else:
-                page.wait_for_load_state('networkidle')
+                pass
 
-            query_frame = get_frame_by_title(page, '查詢內容', timeout=5.0)
-            if query_frame:
-                operational_frame = query_frame
-            else:
-                operational_frame = None
-                deadline = time.time() + (DEFAULT_WAIT / 1000.0)
-                while time.time() < deadline:
-                    try:
-                        for fr in page.frames:
-                            try:
-                                if getattr(fr, 'name', '') == 'qry2' or ('i7000' in (fr.url or '')):
-                                    operational_frame = fr
-                                    break
-                            except Exception:
-                                continue
-                        if operational_frame:
-                            break
-                    except Exception:
-                        pass
-                    time.sleep(0.2)
-                if not operational_frame:
-                    operational_frame = page
-        except Exception:
-            logger.exception('folder9 click error')
+        elapsed = time.time() - start_t
+        logger.debug('folder9 click elapsed=%.2fs, clicked=%s', elapsed, clicked)
 
-        # wait a short while for the operational_frame to populate selectors we need
-        try:
-            found_cycle = False
-            found_table = False
-            deadline = time.time() + (DEFAULT_WAIT / 1000.0)
-            while time.time() < deadline:
-                try:
-                    if operational_frame.locator('select[name="cycle"]').count() > 0:
-                        found_cycle = True
-                except Exception:
-                    found_cycle = False
-                try:
-                    if operational_frame.locator('table#item1').count() > 0:
-                        found_table = True
-                except Exception:
-                    found_table = False
-                if found_cycle or found_table:
-                    break
-                time.sleep(0.5)
-                if not (found_cycle or found_table):
-                    try:
-                        snippet = operational_frame.content()[:10000]
-                        logger.debug('operational_frame content snippet:\n%s', snippet)
-                    except Exception:
-                        logger.exception('could not read operational_frame content')
-        except Exception:
-            logger.exception('operational_frame wait error')
-
-        # wait for content to load, then select USD checkbox (按美元計算(百萬美元))
-        try:
-            labels = []
+        if not clicked:
+            logger.debug('folder9/出口 not found or not clickable')
+        # no networkidle after the click: wait for the query frame (name=qry2 / src i7000)
+        # to navigate instead, unless it is already there
+        operational_frame = next((fr for fr in page.frames if is_query_frame(fr)), None)
+        if operational_frame is None:
             try:
-                labels = operational_frame.query_selector_all('label') or []
+                operational_frame = await page.wait_for_event(
+                    'framenavigated', predicate=is_query_frame, timeout=DEFAULT_WAIT_MS)
             except Exception:
-                labels = get_labels()
-            usd_checkbox = None
-            for lab in labels:
-                try:
-                    txt = lab.inner_text().strip()
-                except Exception:
-                    txt = ''
-                if '按美元計算' in txt:
-                    try:
-                        cb = lab.query_selector('input[type=checkbox]')
-                        if cb:
-                            usd_checkbox = cb
-                            break
-                    except Exception:
-                        pass
-            if usd_checkbox:
-                try:
-                    checked = usd_checkbox.evaluate('el => el.checked')
-                except Exception:
-                    checked = False
-                if not checked:
-                    try:
-                        usd_checkbox.click()
-                    except Exception:
-                        pass
-            else:
-                logger.debug('usd checkbox not found')
-        except Exception:
-            logger.exception('usd checkbox error')
-
-        # select cycle name=cycle value=1 (January) with retries inside operational_frame
+                logger.debug('query frame (qry2) did not appear')
+        if not operational_frame:
+            operational_frame = page
+    except Exception:
+        logger.exception('folder9 click error')
+
+    # wait for the operational_frame to populate selectors we need (cycle select or item1 table)
+    try:
+        await operational_frame.locator('select[name="cycle"], table#item1').first.wait_for(
+            state='attached', timeout=DEFAULT_WAIT_MS)
+    except Exception:
+        logger.debug('operational_frame did not show select[name="cycle"] or table#item1')
+        # serializing the frame is only worth it when the snippet will actually be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            try:
+                snippet = (await operational_frame.content())[:10000]
+                logger.debug('operational_frame content snippet:\n%s', snippet)
+            except Exception:
+                logger.exception('could not read operational_frame content')
+
+    # wait for content to load, then select USD checkbox (按美元計算(百萬美元)); the label
+    # text filter runs in the browser instead of reading every label's inner_text()
+    try:
+        usd_checkbox = operational_frame.locator('label:has-text("按美元計算") input[type=checkbox]').first
+        await usd_checkbox.check(timeout=QUICK_ACTION_TIMEOUT_MS)
+    except Exception:
+        logger.debug('usd checkbox not found')
+
+    # select cycle name=cycle value=1 (January) inside operational_frame; the locator
+    # auto-waits for the select to appear
+    try:
+        await operational_frame.locator('select[name="cycle"]').first.select_option(
+            value='1', timeout=DEFAULT_WAIT_MS)
+    except Exception:
+        logger.debug('cycle select not found in operational frame')
+
+    # ensure nodeIcon34 expanded; the item tree lives in the query frame with the item tables
+    try:
+        await operational_frame.locator('img[name="nodeIcon34"]').first.click(timeout=DEFAULT_WAIT_MS)
+    except Exception:
+        logger.debug('nodeIcon34 not found')
+
+    # after expanding nodeIcon34, find tables with id=35..39 and check all checkboxes under them.
+    # the expanded subtree renders at once, so wait for the first of them only
+    try:
+        item_selectors = [f'table#item{tid}' for tid in range(35, 40)]
         try:
-            sel_found = False
-            deadline = time.time() + (DEFAULT_WAIT / 1000.0)
-            while time.time() < deadline:
-                try:
-                    try:
-                        operational_frame.select_option('select[name="cycle"]', '1')
-                        sel_found = True
-                        break
-                    except Exception:
-                        pass
-
-                    try:
-                        sel_loc = operational_frame.locator('select[name="cycle"]')
-                        if sel_loc.count() > 0:
-                            sel_loc.first.select_option(value='1')
-                            sel_found = True
-                            break
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
-                time.sleep(0.5)
-
-            if not sel_found:
-                logger.debug('cycle select not found in operational frame')
+            await operational_frame.locator(', '.join(item_selectors)).first.wait_for(
+                state='attached', timeout=DEFAULT_WAIT_MS)
         except Exception:
-            logger.exception('cycle select error')
-
-        # ensure nodeIcon34 expanded, click if necessary
+            pass
+        # one round trip for all five tables instead of count()/nth()/evaluate() per checkbox
+        clicked = await operational_frame.evaluate(_CHECK_ALL_JS, item_selectors)
+        for selector, n in zip(item_selectors, clicked):
+            if n < 0:
+                logger.debug('%s not found under operational_frame', selector)
+    except Exception:
+        logger.exception('error checking tables 35-39')
+
+    # select all checkboxes under table id=item1 inside operational_frame
+    try:
+        await operational_frame.locator('table#item1').wait_for(state='attached', timeout=DEFAULT_WAIT_MS)
+        await operational_frame.evaluate(_CHECK_ALL_JS, ['table#item1'])
+    except Exception:
+        logger.debug('table#item1 not found in operational frame')
+
+    # select output mode outmode value=2 (EXCEL)
+    try:
+        await operational_frame.locator('select[name="outmode"]').first.select_option(
+            value='1', timeout=DEFAULT_WAIT_MS)
+    except Exception:
+        logger.exception('outmode select error')
+
+    # click the input.button (class=stybtn)
+    try:
+        btn = operational_frame.locator('input.stybtn').first
         try:
-            node, node_owner = find_element(page, 'img[name="nodeIcon34"]', timeout=DEFAULT_WAIT)
-            if node:
-                try:
-                    node.click()
-                except Exception:
-                    pass
-            else:
-                logger.debug('nodeIcon34 not found')
+            await btn.wait_for(state='attached', timeout=DEFAULT_WAIT_MS)
         except Exception:
-            logger.exception('nodeIcon34 error')
+            btn = None
+        if btn:
+            async with page.expect_download(timeout=20000) as dl:
+                await btn.click()
+            download = await dl.value
+            path = await save_download(download, run_ctx, '機械貨品別出口值')
+            logger.info('downloaded=%s', path)
+        else:
+            logger.debug('submit button not found')
+    except Exception:
+        logger.exception('submit/download error')
 
-        # after expanding nodeIcon34, find tables with id=35..39 and check all checkboxes under them
-        try:
-            for tid in range(35, 40):
-                selector = f'table#item{tid}'
-                table_found = False
-                deadline = time.time() + (DEFAULT_WAIT / 1000.0)
-                while time.time() < deadline:
-                    try:
-                        tbl_loc = operational_frame.locator(selector)
-                        if tbl_loc.count() > 0:
-                            table_found = True
-                            checks = tbl_loc.locator('input[type=checkbox]')
-                            for i in range(checks.count()):
-                                try:
-                                    cb = checks.nth(i)
-                                    checked = False
-                                    try:
-                                        checked = cb.evaluate('el => el.checked')
-                                    except Exception:
-                                        pass
-                                    if not checked:
-                                        try:
-                                            cb.click()
-                                        except Exception:
-                                            pass
-                                except Exception:
-                                    continue
-                            break
-                    except Exception:
-                        pass
-
-                    try:
-                        tbl = operational_frame.query_selector(selector)
-                        if tbl:
-                            table_found = True
-                            inputs = tbl.query_selector_all('input[type=checkbox]')
-                            for inp in inputs:
-                                try:
-                                    checked = False
-                                    try:
-                                        checked = inp.evaluate('el => el.checked')
-                                    except Exception:
-                                        pass
-                                    if not checked:
-                                        try:
-                                            inp.click()
-                                        except Exception:
-                                            pass
-                                except Exception:
-                                    pass
-                            break
-                    except Exception:
-                        pass
-
-                    time.sleep(0.2)
 
-                if not table_found:
-                    logger.debug('table #item%s not found under operational_frame', tid)
-        except Exception:
-            logger.exception('error checking tables 35-39')
+# output_dir may already be the dated folder
+run_async = make_run_async(_do_work, BLOCKED_RESOURCE_TYPES, reuse_dated_dir=True)
 
-        # select all checkboxes under table id=item1 inside operational_frame with retries
-        try:
-            table_found = False
-            deadline = time.time() + (DEFAULT_WAIT / 1000.0)
-            while time.time() < deadline:
-                try:
-                    tbl_loc = operational_frame.locator('table#item1')
-                    if tbl_loc.count() > 0:
-                        table_found = True
-                        checks = tbl_loc.locator('input[type=checkbox]')
-                        for i in range(checks.count()):
-                            cb = checks.nth(i)
-                            try:
-                                checked = cb.evaluate('el => el.checked')
-                            except Exception:
-                                checked = False
-                            if not checked:
-                                try:
-                                    cb.click()
-                                except Exception:
-                                    pass
-                        break
-                except Exception:
-                    pass
-                try:
-                    tbl = operational_frame.query_selector('table#item1')
-                    if tbl:
-                        table_found = True
-                        inputs = tbl.query_selector_all('input[type=checkbox]')
-                        for inp in inputs:
-                            try:
-                                checked = inp.evaluate('el => el.checked')
-                                if not checked:
-                                    inp.click()
-                            except Exception:
-                                pass
-                        break
-                except Exception:
-                    pass
-                time.sleep(0.5)
 
-            if not table_found:
-                logger.debug('table#item1 not found in operational frame')
-        except Exception:
-            logger.exception('item1 checkbox error')
-
-        # select output mode outmode value=2 (EXCEL)
-        try:
-            out_el, out_owner = find_element(operational_frame, 'select[name="outmode"]', timeout=DEFAULT_WAIT)
-            if out_el and out_owner:
-                try:
-                    out_owner.select_option('select[name="outmode"]', value='1', timeout=DEFAULT_WAIT)
-                except Exception:
-                    logger.exception('outmode select error')
-            else:
-                logger.debug('outmode select not found')
-        except Exception:
-            logger.exception('outmode select error')
-
-        # click the input.button (class=stybtn)
-        try:
-            btn, btn_owner = find_element(operational_frame, 'input.stybtn', timeout=DEFAULT_WAIT)
-            if btn:
-                with page.expect_download(timeout=20000) as dl:
-                    btn.click()
-                download = dl.value
-                orig = download.suggested_filename or 'download'
-                _, ext = os.path.splitext(orig)
-                name = f"機械貨品別出口值_{datetime.now().strftime('%Y%m%d')}{ext}"
-                path = os.path.join(out_folder, name)
-                download.save_as(path)
-                logger.info('downloaded=%s', path)
-            else:
-                logger.debug('submit button not found')
-        except Exception:
-            logger.exception('submit/download error')
-
-        try:
-            if keep_browser_open:
-                logger.info('browser left open for inspection. Close manually when done.')
-            else:
-                browser.close()
-        except Exception:
-            pass
+def run(output_dir='.', keep_browser_open=True):
+    # this portal is driven headful (see HEADFUL_OVERRIDES in run_all_scrapers)
+    run_standalone(run_async, output_dir, headless=False, profile='mof')
 
 
 if __name__ == '__main__':
@@ -1,10 +1,10 @@
-from playwright.sync_api import sync_playwright
-from datetime import datetime
-import os
+import asyncio
 import logging
+from urllib.parse import urljoin
+
+from scraper_base import DEFAULT_WAIT_MS, make_run_async, run_standalone, save_download
 
 URL = 'https://statis.moi.gov.tw/micst/webMain.aspx?k=menum'
-DEFAULT_WAIT = 60
 
 TARGET_TITLES = [
     '4.5-辦理建物所有權登記',
@@ -13,87 +13,109 @@ TARGET_TITLES = [
 ]
 
 
-def run(output_dir='.', keep_browser_open=False):
-    os.makedirs(output_dir, exist_ok=True)
-    today = datetime.now().strftime('%Y%m%d')
-    outdir = os.path.join(output_dir, today)
-    os.makedirs(outdir, exist_ok=True)
-
-    with sync_playwright() as p:
-        # if keep_browser_open is True we want headful mode for inspection
-        browser = p.chromium.launch(headless=not keep_browser_open)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # find the table summary="內政統計月報"
-        try:
-            tbl = page.query_selector('table[summary="內政統計月報"]')
-            if not tbl:
-                logging.getLogger(__name__).warning('table not found')
-                if not keep_browser_open:
-                    browser.close()
-                return
-        except Exception as e:
-            logging.getLogger(__name__).exception('table lookup error')
-            if not keep_browser_open:
-                browser.close()
+def sanitize(s: str) -> str:
+    # remove or replace characters invalid for filenames but keep dots
+    repl = s.replace('/', '_').replace(' ', '_')
+    # keep a reasonable subset of chars including the dot
+    return ''.join(c for c in repl if c.isalnum() or c in ('_', '-', '.'))
+
+
+# file name stem per target title, computed once at import
+TARGET_NAMES = {t: sanitize(t) for t in TARGET_TITLES}
+
+
+async def _do_work(page, run_ctx):
+    """Find the TARGET_TITLES rows on the monthly report page and download their XLSX files."""
+    await page.goto(URL, wait_until='domcontentloaded')
+
+    # find the table summary="內政統計月報"
+    try:
+        tbl = await page.wait_for_selector('table[summary="內政統計月報"]', timeout=DEFAULT_WAIT_MS)
+        if not tbl:
+            logging.getLogger(__name__).warning('table not found')
             return
+    except Exception as e:
+        logging.getLogger(__name__).exception('table lookup error')
+        return
+
+    # parse tbody rows
+    try:
+        rows = await tbl.query_selector_all('tbody tr')
+    except Exception:
+        rows = []
+
+    found = {}
+    for t in TARGET_TITLES:
+        found[t] = None
 
-        # parse tbody rows
+    for r in rows:
         try:
-            rows = tbl.query_selector_all('tbody tr')
+            text = await r.inner_text() or ''
         except Exception:
-            rows = []
-
-        found = {}
+            text = ''
         for t in TARGET_TITLES:
-            found[t] = None
+            if t in text and found[t] is None:
+                # find a[title="下載XLSX"] in this row
+                try:
+                    a = await r.query_selector('a[title="下載XLSX"]')
+                    if a:
+                        found[t] = a
+                        logging.getLogger(__name__).info('found download link for %s', t)
+                except Exception:
+                    pass
+
+    # download all found links at once and save with sanitized TARGET title + _YYYYMMDD suffix
+    targets = []
+    for t in TARGET_TITLES:
+        a = found.get(t)
+        if not a:
+            logging.getLogger(__name__).warning('not found link for %s', t)
+            continue
+        targets.append((t, a, TARGET_NAMES[t]))
+    # downloads triggered by clicking on the shared page must not overlap, or one
+    # expect_download could pick up another link's file
+    click_lock = asyncio.Lock()
+    await asyncio.gather(*(_download_one(page, a, t, base_name, run_ctx, click_lock)
+                           for t, a, base_name in targets))
+
 
-        for r in rows:
+async def _download_one(page, a, title, base_name, run_ctx, click_lock):
+    """Download one XLSX link, in its own tab when it has a real href (so several run in parallel)."""
+    try:
+        href = await a.get_attribute('href')
+    except Exception:
+        href = None
+    try:
+        if href and not href.lower().startswith('javascript:'):
+            dl_page = await page.context.new_page()
             try:
-                text = r.inner_text() or ''
-            except Exception:
-                text = ''
-            for t in TARGET_TITLES:
-                if t in text and found[t] is None:
-                    # find a[title="下載XLSX"] in this row
+                async with dl_page.expect_download(timeout=20000) as dl:
                     try:
-                        a = r.query_selector('a[title="下載XLSX"]')
-                        if a:
-                            found[t] = a
-                            logging.getLogger(__name__).info('found download link for %s', t)
+                        await dl_page.goto(urljoin(page.url, href))
                     except Exception:
+                        # goto raises 'Download is starting' when the response is a file
                         pass
+                download = await dl.value
+                path = await save_download(download, run_ctx, base_name, default_ext='.xlsx')
+            finally:
+                await dl_page.close()
+        else:
+            async with click_lock:
+                async with page.expect_download(timeout=20000) as dl:
+                    await a.click()
+                download = await dl.value
+                path = await save_download(download, run_ctx, base_name, default_ext='.xlsx')
+        logging.getLogger(__name__).info('downloaded %s', path)
+    except Exception as e:
+        logging.getLogger(__name__).exception('download error for %s', title)
 
-        # click downloads and save with sanitized TARGET title + _YYYYMMDD suffix
-        def sanitize(s: str) -> str:
-            # remove or replace characters invalid for filenames but keep dots
-            repl = s.replace('/', '_').replace(' ', '_')
-            # keep a reasonable subset of chars including the dot
-            return ''.join(c for c in repl if c.isalnum() or c in ('_', '-', '.'))
-        for t in TARGET_TITLES:
-            a = found.get(t)
-            if not a:
-                logging.getLogger(__name__).warning('not found link for %s', t)
-                continue
-            try:
-                with page.expect_download(timeout=20000) as dl:
-                    a.click()
-                download = dl.value
-                orig = download.suggested_filename or 'download.xlsx'
-                _, ext = os.path.splitext(orig)
-                base_name = sanitize(t)
-                name = f"{base_name}_{today}{ext}"
-                path = os.path.join(outdir, name)
-                download.save_as(path)
-                logging.getLogger(__name__).info('downloaded %s', path)
-            except Exception as e:
-                logging.getLogger(__name__).exception('download error for %s', t)
-
-        if not keep_browser_open:
-            browser.close()
+
+run_async = make_run_async(_do_work)
+
+
+def run(output_dir='.', keep_browser_open=False):
+    # if keep_browser_open is True we want headful mode for inspection
+    run_standalone(run_async, output_dir, headless=not keep_browser_open, profile='moi')
 
 
 if __name__ == '__main__':
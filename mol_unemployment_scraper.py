@@ -1,127 +1,117 @@
-from playwright.sync_api import sync_playwright
-from datetime import datetime
-import os
-import time
-from typing import Callable
+import asyncio
 import logging
+from typing import Awaitable, Callable
+
+from scraper_base import backoff_delay, make_run_async, run_standalone, save_download
 
 URL = 'https://statdb.mol.gov.tw/statiscla/webMain.aspx?sys=210&kind=21&type=1&funid=q02071&rdm=R9696345'
 DEFAULT_WAIT = 60
+# images are kept: the query is submitted by clicking an <img>, which needs a rendered box to be clickable
+BLOCKED_RESOURCE_TYPES = ('font', 'stylesheet', 'media')
 
 OUTPUT_PREFIX = '失業率'
-
-def retry(action: Callable, retries: int = 3, delay: float = 1.0):
+# clicks every unchecked checkbox in the <span> of each 總計 label under the table sel;
+# returns how many 總計 labels there are, or -1 when the table is not there (yet)
+_CHECK_TOTALS_JS = """(sel) => {
+    const tbl = document.querySelector(sel);
+    if (!tbl) return -1;
+    const labels = [...tbl.querySelectorAll('label')].filter(l => l.innerText.includes('總計'));
+    labels.forEach(l => {
+        const span = l.closest('span');
+        if (!span) return;
+        span.querySelectorAll('input[type="checkbox"]').forEach(cb => {
+            if (!cb.checked) cb.click();
+        });
+    });
+    return labels.length;
+}"""
+
+async def retry(action: Callable[[], Awaitable], retries: int = 3, base: float = 0.25, cap: float = 8.0):
     for i in range(retries):
         try:
-            return action()
+            return await action()
         except Exception as e:
             if i == retries - 1:
                 raise
-            time.sleep(delay)
+            await asyncio.sleep(backoff_delay(i, base, cap))
+
+
+async def _do_work(page, run_ctx):
+    """Pick the latest month, tick the 總計 rows and download the query result into run_ctx.out_folder."""
+    # wait for the form itself rather than networkidle (analytics beacons keep the network busy)
+    await page.goto(URL, wait_until='domcontentloaded')
+    try:
+        await page.wait_for_selector('select[name="ymt"]', state='attached', timeout=DEFAULT_WAIT * 1000)
+    except Exception:
+        pass
+
+    # select first option for ymt and set ymf to same (with retries)
+    try:
+        async def pick_dates():
+            # one round trip for the first option's value instead of select + options + attribute
+            try:
+                first_opt = await page.eval_on_selector(
+                    'select[name="ymt"]', 'el => el.options.length ? el.options[0].value : null')
+            except Exception:
+                raise RuntimeError('ymt select not found')
+            if not first_opt:
+                raise RuntimeError('no ymt options')
+            await page.select_option('select[name="ymt"]', first_opt)
+            await page.select_option('select[name="ymf"]', first_opt)
+            return first_opt
+
+        # no fixed pause for dependent JS afterwards: the steps below retry on their own
+        first_val = await retry(pick_dates, retries=5, base=0.5)
+    except Exception as e:
+        logging.getLogger(__name__).exception('error selecting ymt/ymf')
+
+    # set cycle=1 and outmode=1 (with retries)
+    try:
+        await retry(lambda: page.select_option('select[name="cycle"]', '1'), retries=3)
+    except Exception:
+        pass
+    try:
+        await retry(lambda: page.select_option('select[name="outmode"]', '1'), retries=3)
+    except Exception:
+        pass
+
+    # find table summary and then label with text 總計 (with retries)
+    try:
+        async def check_and_click_totals():
+            # label scan and checkbox clicks in one evaluate instead of a round trip per label/checkbox
+            found = await page.evaluate(_CHECK_TOTALS_JS, 'table[summary="統計資料庫表格資料"]')
+            if found < 0:
+                raise RuntimeError('table not found')
+            if not found:
+                raise RuntimeError('no 總計 label found')
+            return True
+
+        await retry(check_and_click_totals, retries=5, base=0.5)
+    except Exception as e:
+        logging.getLogger(__name__).exception('error finding table/labels')
+
+    # click image with alt="查詢圖檔"
+    try:
+        async def click_search_and_download():
+            img = await page.query_selector('img[alt="查詢圖檔"]')
+            if not img:
+                raise RuntimeError('search image not found')
+            async with page.expect_download(timeout=30000) as dl:
+                await img.click()
+            download = await dl.value
+            return await save_download(download, run_ctx, OUTPUT_PREFIX)
+
+        path = await retry(click_search_and_download, retries=4, base=0.5)
+        logging.getLogger(__name__).info('downloaded %s', path)
+    except Exception as e:
+        logging.getLogger(__name__).exception('download error')
+
+
+run_async = make_run_async(_do_work, BLOCKED_RESOURCE_TYPES)
 
 
 def run(output_dir='.', keep_browser_open=False):
-    os.makedirs(output_dir, exist_ok=True)
-    today = datetime.now().strftime('%Y%m%d')
-    outdir = os.path.join(output_dir, today)
-    os.makedirs(outdir, exist_ok=True)
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not keep_browser_open)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # select first option for ymt and set ymf to same (with retries)
-        try:
-            def pick_dates():
-                ymt_sel = page.query_selector('select[name="ymt"]')
-                if not ymt_sel:
-                    raise RuntimeError('ymt select not found')
-                opts = ymt_sel.query_selector_all('option')
-                if not opts:
-                    raise RuntimeError('no ymt options')
-                first_opt = opts[0].get_attribute('value')
-                page.select_option('select[name="ymt"]', first_opt)
-                page.select_option('select[name="ymf"]', first_opt)
-                return first_opt
-
-            first_val = retry(pick_dates, retries=5, delay=1.0)
-            # small wait for dependent JS
-            time.sleep(0.3)
-        except Exception as e:
-            logging.getLogger(__name__).exception('error selecting ymt/ymf')
-
-        # set cycle=1 and outmode=1 (with retries)
-        try:
-            retry(lambda: page.select_option('select[name="cycle"]', '1'), retries=3, delay=0.5)
-        except Exception:
-            pass
-        try:
-            retry(lambda: page.select_option('select[name="outmode"]', '1'), retries=3, delay=0.5)
-        except Exception:
-            pass
-
-        # find table summary and then label with text 總計
-        # find table summary and then label with text 總計 (with retries)
-        try:
-            def check_and_click_totals():
-                tbl = page.query_selector('table[summary="統計資料庫表格資料"]')
-                if not tbl:
-                    raise RuntimeError('table not found')
-                labels = tbl.query_selector_all('label')
-                found_any = False
-                for lab in labels:
-                    try:
-                        if '總計' in (lab.inner_text() or ''):
-                            found_any = True
-                            parent_handle = lab.evaluate_handle('el => el.closest("span")')
-                            if not parent_handle:
-                                continue
-                            parent_el = parent_handle.as_element()
-                            chks = parent_el.query_selector_all('input[type="checkbox"]')
-                            for c in chks:
-                                try:
-                                    # if checkbox not checked, click it
-                                    is_checked = c.get_attribute('checked')
-                                    if not is_checked:
-                                        c.click()
-                                except Exception:
-                                    pass
-                    except Exception:
-                        pass
-                if not found_any:
-                    raise RuntimeError('no 總計 label found')
-                return True
-
-            retry(check_and_click_totals, retries=5, delay=1.0)
-        except Exception as e:
-            logging.getLogger(__name__).exception('error finding table/labels')
-
-        # click image with alt="查詢圖檔"
-        try:
-            def click_search_and_download():
-                img = page.query_selector('img[alt="查詢圖檔"]')
-                if not img:
-                    raise RuntimeError('search image not found')
-                with page.expect_download(timeout=30000) as dl:
-                    img.click()
-                download = dl.value
-                orig = download.suggested_filename or 'download'
-                base, ext = os.path.splitext(orig)
-                name = f"{OUTPUT_PREFIX}_{today}{ext}"
-                path = os.path.join(outdir, name)
-                download.save_as(path)
-                return path
-
-            path = retry(click_search_and_download, retries=4, delay=1.0)
-            logging.getLogger(__name__).info('downloaded %s', path)
-        except Exception as e:
-            logging.getLogger(__name__).exception('download error')
-
-        if not keep_browser_open:
-            browser.close()
+    run_standalone(run_async, output_dir, headless=not keep_browser_open, profile='mol_unemployment')
 
 
 if __name__ == '__main__':
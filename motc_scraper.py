@@ -1,123 +1,152 @@
-from playwright.sync_api import sync_playwright
-from datetime import datetime
+import asyncio
 import os
 import pickle
-import time
 import re
 
-DEFAULT_WAIT = 60
-
-
-def ensure_outfolder(base='.'):
-    tag = datetime.now().strftime('%Y%m%d')
-    out = os.path.join(base, tag)
-    os.makedirs(out, exist_ok=True)
-    return out, tag
+from scraper_base import make_run_async, run_standalone
 
-
-def parse_table_html(page):
-    # find table
-    tbl = page.query_selector('table.pvtTable.table.table-bordered')
-    if not tbl:
+DEFAULT_WAIT = 60
+# stylesheets are kept: innerText of the pivot table cells depends on CSS visibility
+BLOCKED_RESOURCE_TYPES = ('image', 'font', 'media')
+TABLE_SELECTOR = 'table.pvtTable.table.table-bordered'
+# thousands-separated numbers such as 1,234,567.8
+_NUM_RE = re.compile(r'^[0-9]{1,3}(?:,[0-9]{3})+(?:\.?[0-9]+)?$')
+# true once a table matching sel exists and is not the pre-click element old
+_NEW_TABLE_JS = """([sel, old]) => {
+    const t = document.querySelector(sel);
+    return !!t && t !== old;
+}"""
+# returns {thead: [[th text]], tbody: [[first th text or null, td texts...]]} for the table,
+# or null. body rows keep only their first th (the row label), as the per-cell version did
+_TABLE_JS = """(sel) => {
+    const tbl = document.querySelector(sel);
+    if (!tbl) return null;
+    const rows = (part) => {
+        const sec = tbl.querySelector(part);
+        return sec ? [...sec.querySelectorAll('tr')] : [];
+    };
+    const text = (c) => c.innerText.trim();
+    const thead = rows('thead').map(tr => [...tr.querySelectorAll('th')].map(text));
+    const tbody = rows('tbody').map(tr => {
+        const th = tr.querySelector('th');
+        return [th ? text(th) : null].concat([...tr.querySelectorAll('td')].map(text));
+    });
+    return { thead, tbody };
+}"""
+
+
+def _write_pickle(obj, dest):
+    # serialize first, then write in one call
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(dest, 'wb') as f:
+        f.write(data)
+
+
+async def parse_table_html(page):
+    # pull the whole table in one evaluate call instead of one inner_text() per cell
+    raw = await page.evaluate(_TABLE_JS, TABLE_SELECTOR)
+    if raw is None:
         return None
 
-    # extract thead
-    thead = []
-    th_el = tbl.query_selector('thead')
-    if th_el:
-        for tr in th_el.query_selector_all('tr'):
-            row = [th.inner_text().strip() for th in tr.query_selector_all('th')]
-            thead.append(row)
-
+    thead = raw['thead']
     tbody = []
-    tb_el = tbl.query_selector('tbody')
-    if tb_el:
-        for tr in tb_el.query_selector_all('tr'):
-            # first child is th (if present), then all td
-            cells = []
-            ths = tr.query_selector_all('th')
-            if ths:
-                # take first th
-                cells.append(ths[0].inner_text().strip())
-            tds = tr.query_selector_all('td')
-            for td in tds:
-                txt = td.inner_text().strip()
-                # remove thousands separators like '1,234' -> '1234'
-                if re.match(r'^[0-9]{1,3}(?:,[0-9]{3})+(?:\.?[0-9]+)?$', txt):
-                    txt = txt.replace(',', '')
-                cells.append(txt)
-            tbody.append(cells)
+    for cells in raw['tbody']:
+        row = [] if cells[0] is None else [cells[0]]
+        for txt in cells[1:]:
+            # remove thousands separators like '1,234' -> '1234'
+            if _NUM_RE.match(txt):
+                txt = txt.replace(',', '')
+            row.append(txt)
+        tbody.append(row)
 
     return {'thead': thead, 'tbody': tbody}
 
 
-def run_seq(seq, target_name, output_dir='.', keep_browser_open=False):
+async def run_seq(page, run_ctx, seq, target_name):
+    """Open MOTC statistics table Seq=seq, switch it to monthly and pickle it as target_name_YYYYMMDD.pickle."""
     URL = f'https://statis.motc.gov.tw/motc/Statistics/Display?Seq={seq}'
-    out_folder, tag = ensure_outfolder(output_dir)
-    fname = f'{target_name}_{tag}.pickle'
-    dest = os.path.join(out_folder, fname)
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not keep_browser_open)
-        context = browser.new_context()
-        page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # checkbox logic
-        try:
-            # use evaluate-based clicks to avoid Playwright auto-scrolling
-            page.evaluate("() => { const y = document.querySelector('#check-period-show-year'); if(y && y.checked) y.click(); const m = document.querySelector('#check-period-show-month'); if(m && !m.checked) m.click(); }")
-        except Exception:
-            pass
-
-        # click set period button
-        try:
-            # click via evaluate to avoid scrolling
-            page.evaluate("() => { const b = document.getElementById('btn-set-period'); if(b) b.click(); }")
-        except Exception:
-            pass
-
-        # wait a bit for table to render
-        time.sleep(1)
-        page.wait_for_load_state('networkidle')
-
-        table_dict = parse_table_html(page)
-        if table_dict is None:
-                import logging
-                logging.getLogger(__name__).warning('table not found for seq %s', seq)
-        else:
-            # save as pickle
-            with open(dest, 'wb') as f:
-                pickle.dump(table_dict, f)
+    fname = f'{target_name}_{run_ctx.date_tag}.pickle'
+    dest = os.path.join(run_ctx.out_folder, fname)
+
+    # the pivot table is drawn by script after load; wait for it (it is also what
+    # old_table below must capture) instead of networkidle
+    await page.goto(URL, wait_until='domcontentloaded')
+    try:
+        await page.wait_for_selector(TABLE_SELECTOR, state='attached', timeout=DEFAULT_WAIT * 1000)
+    except Exception:
+        pass
+
+    # checkbox logic
+    try:
+        # use evaluate-based clicks to avoid Playwright auto-scrolling
+        await page.evaluate("() => { const y = document.querySelector('#check-period-show-year'); if(y && y.checked) y.click(); const m = document.querySelector('#check-period-show-month'); if(m && !m.checked) m.click(); }")
+    except Exception:
+        pass
+
+    # the pivot table is rebuilt (a new element) when the period changes; keep the
+    # current one to tell the re-rendered table apart from it
+    old_table = await page.query_selector(TABLE_SELECTOR)
+
+    # click set period button
+    try:
+        # click via evaluate to avoid scrolling
+        await page.evaluate("() => { const b = document.getElementById('btn-set-period'); if(b) b.click(); }")
+    except Exception:
+        pass
+
+    # wait for the monthly table itself instead of a fixed sleep + networkidle
+    try:
+        await page.wait_for_function(_NEW_TABLE_JS, arg=[TABLE_SELECTOR, old_table], timeout=DEFAULT_WAIT * 1000)
+    except Exception:
+        import logging
+        logging.getLogger(__name__).warning('table did not re-render for seq %s', seq)
+
+    table_dict = await parse_table_html(page)
+    if table_dict is None:
             import logging
-            logging.getLogger(__name__).info('saved %s', dest)
-
-        if not keep_browser_open:
-            context.close()
-            browser.close()
-
-
-def run_seq901(output_dir='.', keep_browser_open=False):
-    run_seq(901, '汽車客貨運量概況', output_dir, keep_browser_open)
-
-
-def run_seq97(output_dir='.', keep_browser_open=False):
-    run_seq(97, '高速公路計程收費通行量', output_dir, keep_browser_open)
-
-
-def run_seq206(output_dir='.', keep_browser_open=False):
-    run_seq(206, '國際商港貨櫃裝卸量', output_dir, keep_browser_open)
-
-if __name__ == '__main__':
-    run_seq901('.', False)
-    run_seq97('.', False)
-    run_seq206('.', False)
+            logging.getLogger(__name__).warning('table not found for seq %s', seq)
+    else:
+        # save as pickle (preprocess_motc reads it); off the event loop, so the other
+        # scrapers sharing it keep running while the table is serialized and written
+        await asyncio.to_thread(_write_pickle, table_dict, dest)
+        import logging
+        logging.getLogger(__name__).info('saved %s', dest)
+
+
+# (seq, target name) of the MOTC tables to fetch
+SEQS = [
+    (901, '汽車客貨運量概況'),
+    (97, '高速公路計程收費通行量'),
+    (206, '國際商港貨櫃裝卸量'),
+]
+
+
+async def _do_work(page, run_ctx):
+    """Fetch every table in SEQS at once, each on its own page of one context."""
+    extra_pages = [await page.context.new_page() for _ in SEQS[1:]]
+    try:
+        results = await asyncio.gather(
+            *(run_seq(p, run_ctx, seq, target_name)
+              for (seq, target_name), p in zip(SEQS, [page] + extra_pages)),
+            return_exceptions=True,
+        )
+    finally:
+        for p in extra_pages:
+            await p.close()
+    # one failed table must not cancel the others; report the first failure afterwards
+    for res in results:
+        if isinstance(res, BaseException):
+            raise res
+
+
+run_async = make_run_async(_do_work, BLOCKED_RESOURCE_TYPES)
 
 
 # unified run wrapper for run_all
 def run(output_dir='.', keep_browser_open=False):
     # run all three sequences
-    run_seq901(output_dir, keep_browser_open)
-    run_seq97(output_dir, keep_browser_open)
-    run_seq206(output_dir, keep_browser_open)
\ No newline at end of file
+    run_standalone(run_async, output_dir, headless=not keep_browser_open, profile='motc')
+
+
+if __name__ == '__main__':
+    run('.', False)
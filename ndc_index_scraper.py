@@ -1,227 +1,153 @@
-from playwright.sync_api import sync_playwright
-from datetime import datetime
-import os
-import time
+import asyncio
 import logging
+import re
+
+from scraper_base import backoff_delay, make_run_async, run_standalone, save_download
 
 DEFAULT_WAIT = 60
+# stylesheets are kept: the SPA shows/hides its views with CSS and the waits check visibility
+BLOCKED_RESOURCE_TYPES = ('image', 'font', 'media')
+URL = 'https://index.ndc.gov.tw/n/zh_tw/data'
+# download triggers of the index pages, most specific first
+DOWNLOAD_SELECTORS = ("[ng-click='download_xls()']", "[title^='確定輸出']", "button:has-text('下載')")
+# the same list as one selector, so a single locator waits for whichever form shows up first
+DOWNLOAD_SELECTOR = ', '.join(DOWNLOAD_SELECTORS)
 
 def sanitize(s: str) -> str:
     return ''.join(c for c in s if c.isalnum() or c in ' _-.').strip()
 
-def ensure_outfolder(base='.'):
-    tag = datetime.now().strftime('%Y%m%d')
-    out = os.path.join(base, tag)
-    os.makedirs(out, exist_ok=True)
-    return out, tag
-
-def _click_fallback(page, selectors):
+async def _click_fallback(page, selectors):
     for sel in selectors:
         try:
             # wait a short moment for element to appear
-            el = page.wait_for_selector(sel, timeout=3000)
+            el = await page.wait_for_selector(sel, timeout=3000)
         except Exception:
             el = None
         if el:
-            for _ in range(3):
+            for attempt in range(3):
                 try:
-                    el.click()
+                    await el.click()
                     return True
                 except Exception:
                     try:
-                        page.evaluate('(e) => e.click()', el)
+                        await page.evaluate('(e) => e.click()', el)
                         return True
                     except Exception:
-                        time.sleep(0.3)
+                        await asyncio.sleep(backoff_delay(attempt))
                         continue
     return False
 
-def download_with_name(page, out_folder, target_name, timeout=30000):
-    with page.expect_download(timeout=timeout) as dr:
-        # assume page triggered download already
+async def _wait_for_section(page, section):
+    """Wait until the data SPA has routed to section (PMI/NMI/eco) and shows the download button."""
+    try:
+        await page.wait_for_url(re.compile(rf'/data/{section}', re.I), wait_until='domcontentloaded', timeout=10000)
+        await page.wait_for_selector("[ng-click='download_xls()']", state='visible', timeout=10000)
+    except Exception:
         pass
-    # unreachable in direct form; caller should use expect_download context
-
-def run_pmi(output_dir='.', keep_browser_open=False):
-    out_folder, tag = ensure_outfolder(output_dir)
-    target = f'製造業採購經理人指數(PMI)_{tag}'
-    URL = 'https://index.ndc.gov.tw/n/zh_tw/data'
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not keep_browser_open)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # go to PMI section: prefer menu item under div#menu with title
-        try:
-            page.wait_for_selector("div#menu [title='製造採購經理人指數']", timeout=10000)
-            menu_el = page.query_selector("div#menu [title='製造採購經理人指數']")
-            if menu_el:
-                try:
-                    menu_el.click()
-                except Exception:
-                    page.evaluate('(e)=>e.click()', menu_el)
-            else:
-                _click_fallback(page, ["a[href='/n/zh_tw/data/PMI#/']", "a:has-text('PMI')"])
-        except Exception:
-            _click_fallback(page, ["a[href='/n/zh_tw/data/PMI#/']", "a:has-text('PMI')"])
-        page.wait_for_load_state('networkidle')
-        time.sleep(1)
-
-        # click download button by ng-click or title
-        selectors = ["[ng-click='download_xls()']", "[title^='確定輸出']", "button:has-text('下載')"]
-        el = None
-        for sel in selectors:
-            try:
-                page.wait_for_selector(sel, timeout=5000)
-                el = page.query_selector(sel)
-            except Exception:
-                el = None
-            if el:
-                break
 
-        if el:
-            # try multiple times to trigger download reliably
-            for attempt in range(3):
-                try:
-                    with page.expect_download(timeout=30000) as dd:
-                        el.click()
-                    dl = dd.value
-                    ext = os.path.splitext(dl.suggested_filename or '')[1] or '.xls'
-                    dest = os.path.join(out_folder, sanitize(target) + ext)
-                    dl.save_as(dest)
-                    logging.getLogger(__name__).info('downloaded %s', dest)
-                    break
-                except Exception as e:
-                    if attempt == 2:
-                        raise
-                    time.sleep(1)
-        else:
-            logging.getLogger(__name__).warning('PMI download element not found')
-
-        if not keep_browser_open:
-            context.close(); browser.close()
-
-def run_nmi(output_dir='.', keep_browser_open=False):
-    out_folder, tag = ensure_outfolder(output_dir)
-    target = f'非製造業經理人指數(NMI)_{tag}'
-    URL = 'https://index.ndc.gov.tw/n/zh_tw/data'
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not keep_browser_open)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # go to NMI section: prefer menu item under div#menu with title
+async def _download_xls(page, run_ctx, prefix, label, selector=DOWNLOAD_SELECTOR, attempts=3):
+    """Click the first element matching selector and save the download as <prefix>_YYYYMMDD.xls(x).
+
+    The click is retried with jittered backoff; the last failure is raised.
+    """
+    # one wait on the comma-joined list instead of a 5 s wait per selector form in turn
+    el = page.locator(selector).first
+    try:
+        await el.wait_for(state='visible', timeout=10000)
+    except Exception:
+        logging.getLogger(__name__).warning('%s download element not found', label)
+        return None
+
+    # try multiple times to trigger download reliably
+    for attempt in range(attempts):
         try:
-            page.wait_for_selector("div#menu [title='非製造業經理人指數']", timeout=10000)
-            menu_el = page.query_selector("div#menu [title='非製造業經理人指數']")
-            if menu_el:
-                try:
-                    menu_el.click()
-                except Exception:
-                    page.evaluate('(e)=>e.click()', menu_el)
-            else:
-                _click_fallback(page, ["a[href='/n/zh_tw/data/NMI#']", "a:has-text('NMI')"])
+            async with page.expect_download(timeout=30000) as dd:
+                await el.click()
+            dl = await dd.value
+            dest = await save_download(dl, run_ctx, sanitize(prefix), default_ext='.xls')
+            logging.getLogger(__name__).info('downloaded %s', dest)
+            return dest
         except Exception:
-            _click_fallback(page, ["a[href='/n/zh_tw/data/NMI#']", "a:has-text('NMI')"])
-        page.wait_for_load_state('networkidle')
-        time.sleep(1)
-
-        selectors = ["[ng-click='download_xls()']", "[title^='確定輸出']", "button:has-text('下載')"]
-        el = None
-        for sel in selectors:
-            try:
-                page.wait_for_selector(sel, timeout=5000)
-                el = page.query_selector(sel)
-            except Exception:
-                el = None
-            if el:
-                break
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base=1.0))
+
+async def run_pmi(page, run_ctx):
+    prefix = '製造業採購經理人指數(PMI)'
+    # the targeted waits below replace networkidle, which the SPA's polling keeps from settling
+    await page.goto(URL, wait_until='domcontentloaded')
+
+    # go to PMI section: prefer menu item under div#menu with title
+    # one auto-waiting locator click instead of wait_for_selector + query_selector + click
+    try:
+        await page.locator("div#menu [title='製造採購經理人指數']").first.click(timeout=10000)
+    except Exception:
+        await _click_fallback(page, ["a[href='/n/zh_tw/data/PMI#/']", "a:has-text('PMI')"])
+    await _wait_for_section(page, 'PMI')
+
+    await _download_xls(page, run_ctx, prefix, 'PMI')
+
+async def run_nmi(page, run_ctx):
+    prefix = '非製造業經理人指數(NMI)'
+    # the targeted waits below replace networkidle, which the SPA's polling keeps from settling
+    await page.goto(URL, wait_until='domcontentloaded')
+
+    # go to NMI section: prefer menu item under div#menu with title
+    # one auto-waiting locator click instead of wait_for_selector + query_selector + click
+    try:
+        await page.locator("div#menu [title='非製造業經理人指數']").first.click(timeout=10000)
+    except Exception:
+        await _click_fallback(page, ["a[href='/n/zh_tw/data/NMI#']", "a:has-text('NMI')"])
+    await _wait_for_section(page, 'NMI')
+
+    await _download_xls(page, run_ctx, prefix, 'NMI')
+
+async def run_eco(page, run_ctx):
+    prefix = '景氣指標及燈號'
+    # the targeted waits below replace networkidle, which the SPA's polling keeps from settling
+    await page.goto(URL, wait_until='domcontentloaded')
+
+    # navigate to eco, once the SPA has rendered its links
+    try:
+        await page.wait_for_selector("a[href*='data/eco']", state='attached', timeout=10000)
+    except Exception:
+        pass
+    await _click_fallback(page, ["a[href='n/zh_tw/data/eco#/']", "a[href='/n/zh_tw/data/eco#/']", "a:has-text('景氣指標')"])
+    await _wait_for_section(page, 'eco')
 
-        if el:
-            for attempt in range(3):
-                try:
-                    with page.expect_download(timeout=30000) as dd:
-                        el.click()
-                    dl = dd.value
-                    ext = os.path.splitext(dl.suggested_filename or '')[1] or '.xls'
-                    dest = os.path.join(out_folder, sanitize(target) + ext)
-                    dl.save_as(dest)
-                    print('downloaded', dest)
-                    break
-                except Exception:
-                    if attempt == 2:
-                        raise
-                    time.sleep(1)
-        else:
-            print('NMI download element not found')
-
-        if not keep_browser_open:
-            context.close(); browser.close()
-
-def run_eco(output_dir='.', keep_browser_open=False):
-    out_folder, tag = ensure_outfolder(output_dir)
-    target = f'景氣指標及燈號_{tag}'
-    URL = 'https://index.ndc.gov.tw/n/zh_tw/data'
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not keep_browser_open)
-        context = browser.new_context(accept_downloads=True)
-        page = context.new_page()
-        page.goto(URL)
-        page.wait_for_load_state('networkidle')
-
-        # navigate to eco
-        _click_fallback(page, ["a[href='n/zh_tw/data/eco#/']", "a[href='/n/zh_tw/data/eco#/']", "a:has-text('景氣指標')"])
-        page.wait_for_load_state('networkidle')
-
-        # open 指標構成項目
-        if not _click_fallback(page, ["[title='指標構成項目']", "button:has-text('指標構成項目')"]):
-            print('指標構成項目 按鈕未找到')
-
-        # click select_all buttons
-        for bid in ('#select_all_1', '#select_all_2', '#select_all_3'):
-            _click_fallback(page, [f"button{bid}", f"[role='button']{bid}", f"#{bid.lstrip('#')}"])
-
-        # click download
-        selectors = ["[ng-click='download_xls()']", "[title^='確定輸出']", "button:has-text('下載')"]
-        el = None
-        for sel in selectors:
-            try:
-                page.wait_for_selector(sel, timeout=5000)
-                el = page.query_selector(sel)
-            except Exception:
-                el = None
-            if el:
-                break
+    # open 指標構成項目
+    if not await _click_fallback(page, ["[title='指標構成項目']", "button:has-text('指標構成項目')"]):
+        print('指標構成項目 按鈕未找到')
 
-        if el:
-            for attempt in range(3):
-                try:
-                    with page.expect_download(timeout=30000) as dd:
-                        el.click()
-                    dl = dd.value
-                    ext = os.path.splitext(dl.suggested_filename or '')[1] or '.xls'
-                    dest = os.path.join(out_folder, sanitize(target) + ext)
-                    dl.save_as(dest)
-                    print('downloaded', dest)
-                    break
-                except Exception:
-                    if attempt == 2:
-                        raise
-                    time.sleep(1)
-        else:
-            print('ECO download element not found')
+    # click select_all buttons
+    for bid in ('#select_all_1', '#select_all_2', '#select_all_3'):
+        await _click_fallback(page, [f"button{bid}", f"[role='button']{bid}", f"#{bid.lstrip('#')}"])
+
+    await _download_xls(page, run_ctx, prefix, 'ECO')
+
+async def _do_work(page, run_ctx):
+    """Download PMI, NMI and the business indicators at once, each on its own page of one context."""
+    scrapes = (run_pmi, run_nmi, run_eco)
+    extra_pages = [await page.context.new_page() for _ in scrapes[1:]]
+    try:
+        results = await asyncio.gather(
+            *(scrape(p, run_ctx) for scrape, p in zip(scrapes, [page] + extra_pages)),
+            return_exceptions=True,
+        )
+    finally:
+        for p in extra_pages:
+            await p.close()
+    # one failed index must not cancel the other downloads; report the first failure afterwards
+    for res in results:
+        if isinstance(res, BaseException):
+            raise res
+
+
+run_async = make_run_async(_do_work, BLOCKED_RESOURCE_TYPES)
 
-        if not keep_browser_open:
-            context.close(); browser.close()
 
 def run_all(output_dir='.', keep_browser_open=False):
-    run_pmi(output_dir, keep_browser_open)
-    run_nmi(output_dir, keep_browser_open)
-    run_eco(output_dir, keep_browser_open)
+    run_standalone(run_async, output_dir, headless=not keep_browser_open, profile='ndc_index')
 
 if __name__ == '__main__':
     run_all('.', True)
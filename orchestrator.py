@@ -0,0 +1,97 @@
+"""
+orchestrator.py
+
+Usage:
+    python3 orchestrator.py [-o OUTPUT] [--headful]
+
+Runs the async-capable scrapers concurrently against a single Chromium
+process. Each scraper gets its own BrowserContext (separate cookies and
+downloads) via its run_async(browser, output_dir), so only one browser
+engine is started instead of one per scraper. Portals listed in
+run_all_scrapers.HEADFUL_OVERRIDES (mof, ndc) are driven headful, so those run on
+a second, headful browser gathered alongside the shared one.
+"""
+
+import asyncio
+import time
+import traceback
+
+from run_all_scrapers import HEADFUL_OVERRIDES
+from scraper_base import shared_async_browser
+import moea_scraper
+import mof_scraper
+import moi_scraper
+import mol_average_hours_scraper
+import mol_reduce_hours_scraper
+import mol_unemployment_scraper
+import motc_scraper
+import ndc_index_scraper
+
+# scrapers that expose run_async(browser, output_dir) and a friendly name;
+# mof and ndc run on the headful browser, as in run_all_scrapers
+ASYNC_SCRAPERS = [
+    (motc_scraper, "交通部"),
+    (moea_scraper, "經濟部能源署"),
+    (mof_scraper, "財政部"),
+    (ndc_index_scraper, "國發會"),
+    (moi_scraper, "內政部"),
+    (mol_average_hours_scraper, "勞動部-平均工時"),
+    (mol_reduce_hours_scraper, "勞動部-減少工時"),
+    (mol_unemployment_scraper, "勞動部-失業率"),
+]
+
+
+async def _timed(mod, browser, output_dir):
+    start = time.time()
+    await mod.run_async(browser, output_dir)
+    return round(time.time() - start, 2)
+
+
+async def _run_group(mods, output_dir, headless):
+    """Run mods at once on one browser launched for them; results in the order of mods."""
+    if not mods:
+        return []
+    async with shared_async_browser(headless=headless) as browser:
+        return await asyncio.gather(
+            *(_timed(mod, browser, output_dir) for mod in mods),
+            return_exceptions=True,
+        )
+
+
+async def main(output_dir='.', headless=True):
+    """Run every scraper in ASYNC_SCRAPERS at once and return {module name: elapsed seconds or error}."""
+    groups = (
+        ([e for e in ASYNC_SCRAPERS if e[0].__name__ not in HEADFUL_OVERRIDES], headless),
+        ([e for e in ASYNC_SCRAPERS if e[0].__name__ in HEADFUL_OVERRIDES], False),
+    )
+    outcomes = await asyncio.gather(
+        *(_run_group([mod for mod, _ in entries], output_dir, group_headless) for entries, group_headless in groups),
+        return_exceptions=True,
+    )
+
+    summary = {}
+    for (entries, _), outcome in zip(groups, outcomes):
+        # a browser that failed to launch fails every scraper of its group
+        results = [outcome] * len(entries) if isinstance(outcome, BaseException) else outcome
+        for (mod, friendly), res in zip(entries, results):
+            if isinstance(res, BaseException):
+                print('failed', mod.__name__, friendly, ''.join(traceback.format_exception(type(res), res, res.__traceback__)))
+                summary[mod.__name__] = repr(res)
+            else:
+                print('done', mod.__name__, friendly, f'{res}s')
+                summary[mod.__name__] = res
+    return summary
+
+
+def run(output_dir='.', headless=True):
+    return asyncio.run(main(output_dir=output_dir, headless=headless))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', '-o', default='.')
+    parser.add_argument('--headful', action='store_true', help='Show the shared browser window')
+    args = parser.parse_args()
+
+    run(output_dir=args.output, headless=not args.headful)
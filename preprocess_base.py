@@ -0,0 +1,84 @@
+"""
+preprocess_base.py
+
+Helpers shared by the preprocess_*.py converters and aggregate_preprocessed:
+
+- input_digest / output_is_current / record_digest: skip rewriting a (修正)
+  output when its input (and the converter's parser version) is unchanged,
+  using a .hash sidecar next to the output.
+- col_index: 1-based column number of an xlsx cell reference's letters, for
+  the converters that read sheet xml themselves.
+- cell_to_str: text of a calamine cell value, as the sheet xml stores it.
+- openpyxl_row: an openpyxl values_only row converted like pandas' openpyxl reader.
+"""
+
+import hashlib
+import os
+import string
+
+# sidecar next to each (修正) output holding the digest of the input it was written from
+HASH_SUFFIX = '.hash'
+# 1-based column number per cell-reference letters, 'A'..'ZZ'
+_COL_IDX = {L: i for i, L in enumerate(string.ascii_uppercase, 1)}
+_COL_IDX.update({a + b: _COL_IDX[a] * 26 + _COL_IDX[b]
+                 for a in string.ascii_uppercase for b in string.ascii_uppercase})
+
+
+def col_index(letters: str) -> int:
+    # table lookup, computed only for references past ZZ
+    try:
+        return _COL_IDX[letters]
+    except KeyError:
+        idx = 0
+        for ch in letters.upper():
+            idx = idx * 26 + (ord(ch) - 64)
+        return idx
+
+
+def input_digest(path: str, version: int) -> str:
+    """blake2b of the input file, tagged with the caller's parser version so a parser change also counts as new input."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return f'{version}:{h.hexdigest()}'
+
+
+def output_is_current(out_path: str, digest: str) -> bool:
+    # the output exists and its .hash sidecar says it was written from this exact input
+    try:
+        with open(str(out_path) + HASH_SUFFIX, encoding='ascii') as f:
+            return f.read().strip() == digest and os.path.exists(out_path)
+    except OSError:
+        return False
+
+
+def record_digest(out_path: str, digest: str) -> None:
+    try:
+        with open(str(out_path) + HASH_SUFFIX, 'w', encoding='ascii') as f:
+            f.write(digest)
+    except OSError:
+        pass
+
+
+def cell_to_str(v) -> str:
+    """Render a calamine cell value the way it is stored in the sheet xml."""
+    if v is None:
+        return ''
+    if isinstance(v, bool):
+        return str(int(v))
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def openpyxl_row(values, as_str: bool = False, empty=None) -> list:
+    """Convert an openpyxl values_only row the way pandas' openpyxl reader does.
+
+    Integral floats become ints; with as_str every other cell is then str()-ed.
+    Empty cells become empty.
+    """
+    if as_str:
+        return [empty if v is None else str(int(v) if isinstance(v, float) and v.is_integer() else v)
+                for v in values]
+    return [empty if v is None else int(v) if isinstance(v, float) and v.is_integer() else v for v in values]
@@ -4,52 +4,76 @@ import re
 from typing import Any
 import pandas as pd
 
+from aggregate_preprocessed import write_xlsx
+
+PREFIX = '外銷訂單_'
+# exact scraper output name: 外銷訂單_YYYYMMDD.parquet / .pickle
+_RE_OUTPUT_NAME = re.compile(rf'^{re.escape(PREFIX)}(\d{{8}})\.(?:parquet|pickle)$')
+_RE_YEAR_NUM = re.compile(r'(\d{2,4})')
+_RE_MONTH_NUM = re.compile(r'(\d{1,2})')
 
 def process_folder(folder: str):
-    prefix = '外銷訂單_'
-    # prefer exact pattern: 外銷訂單_YYYYMMDD.pickle
-    found = None
-    candidates = []
+    # one directory scan: exact 外銷訂單_YYYYMMDD.parquet / .pickle names (with their date tag),
+    # and any other 外銷訂單_*.pickle/.pkl as a fallback
+    strict = []
+    loose = []
     for fn in os.listdir(folder):
-        if re.match(rf'^{re.escape(prefix)}\d{{8}}\.pickle$', fn):
-            candidates.append(fn)
-    if candidates:
-        # pick latest by name (lexicographic on YYYYMMDD)
-        fn = sorted(candidates)[-1]
-        found = os.path.join(folder, fn)
+        m = _RE_OUTPUT_NAME.match(fn)
+        if m:
+            strict.append((m.group(1), fn.endswith('.parquet'), fn))
+        elif fn.startswith(PREFIX) and fn.endswith(('.pickle', '.pkl')):
+            loose.append(fn)
+    if strict:
+        # pick latest by YYYYMMDD; parquet wins a tie
+        date_tag, _, fn = max(strict)
+    elif loose:
+        # prefer .pickle over .pkl and pick latest
+        fn = max(loose, key=lambda c: (c.endswith('.pickle'), c))
+        date_tag = ''
     else:
-        # fallback: accept any file starting with prefix and .pickle/.pkl
-        for fn in os.listdir(folder):
-            if fn.startswith(prefix) and (fn.endswith('.pickle') or fn.endswith('.pkl')):
-                candidates.append(fn)
-        if candidates:
-            # prefer .pickle over .pkl and pick latest
-            candidates = sorted(candidates)
-            # try to pick a .pickle if present
-            pickle_candidates = [c for c in candidates if c.endswith('.pickle')]
-            fn = (pickle_candidates or candidates)[-1]
-            found = os.path.join(folder, fn)
-    if not found:
         return
     # perform conversion and write output (no printing)
-    _convert_pickle_to_excel(found, folder)
+    _convert_pickle_to_excel(os.path.join(folder, fn), folder, date_tag)
     # note: silent operation — file is written (or exception raised)
 
 
+def _load_scraped(path: str) -> dict:
+    """Load the scraper output ({'thead': [...], 'tbody': [...]}) from .parquet or pickle."""
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+        return {part: df.loc[df['section'] == part, 'line'].tolist() for part in ('thead', 'tbody')}
+    # one read of the whole (small) file, then unpickle from memory instead of many small buffered reads
+    with open(path, 'rb') as f:
+        return pickle.loads(f.read())
+
+
 def _roc_to_ad_year(roc_year_str: str) -> int:
     # accept strings like '113年' or '113' -> return 2024 for 113
     s = str(roc_year_str).strip()
-    m = re.search(r'(\d{2,4})', s)
+    m = _RE_YEAR_NUM.search(s)
     if not m:
         raise ValueError('invalid roc year: ' + s)
     y = int(m.group(1))
     return y + 1911
 
 
-def _convert_pickle_to_excel(pickle_path: str, folder: str):
+def _roc_to_yyyy_mm(s: str, _year_search=_RE_YEAR_NUM.search, _month_search=_RE_MONTH_NUM.search) -> str:
+    # '113年5月' -> '2024-05'; the month is the first number after the year, '01' when there is none
+    # (the bound .search methods are default args so each call reads them as fast locals)
+    s = s.strip()
+    m = _year_search(s)
+    if not m:
+        return ''
+    mm = _month_search(s, m.end())
+    ad_y = int(m.group(1)) + 1911
+    if mm:
+        return f"{ad_y:04d}-{int(mm.group(1)):02d}"
+    return f"{ad_y:04d}-01"
+
+
+def _convert_pickle_to_excel(pickle_path: str, folder: str, date_tag: str = None):
     # reads pickle, parses thead/tbody per rules, merges first two cols into ROC date, propagates year, converts to YYYY-MM
-    with open(pickle_path, 'rb') as f:
-        data = pickle.load(f)
+    data = _load_scraped(pickle_path)
 
     thead = data.get('thead')
     if isinstance(thead, list) and len(thead) == 1 and isinstance(thead[0], str):
@@ -64,96 +88,79 @@ def _convert_pickle_to_excel(pickle_path: str, folder: str):
     # make headers unique by appending suffix for duplicates
     headers = []
     seen = {}
+    # the generated '__dup' names, so the cleanup below need not scan every column name
+    dup_headers = set()
     for h in raw_headers:
         key = h
         if key in seen:
             seen[key] += 1
             newh = f"{h}__dup{seen[key]}"
+            dup_headers.add(newh)
         else:
             seen[key] = 1
             newh = h
         headers.append(newh)
 
     tbody = data.get('tbody', [])
-    rows = []
-    for r in tbody:
-        s = r if isinstance(r, str) else str(r)
-        fields = [f.strip() for f in s.split(',')]
-        rows.append(fields)
+    # split every row in one vectorized pass; short rows come back as None and are padded with ''
+    ser = pd.Series([r if isinstance(r, str) else str(r) for r in tbody], dtype=object)
+    if len(ser):
+        df = ser.str.split(',', expand=True).fillna('').apply(lambda col: col.str.strip())
+    else:
+        df = pd.DataFrame()
 
-    maxcols = max(len(headers), max((len(r) for r in rows), default=0))
+    maxcols = max(len(headers), df.shape[1])
     # extend headers if needed
     if len(headers) < maxcols:
         for i in range(len(headers), maxcols):
             headers.append(f'UNNAMED_{i+1}')
 
-    # normalize rows
-    norm_rows = []
-    for fields in rows:
-        if len(fields) < maxcols:
-            fields = fields + [''] * (maxcols - len(fields))
-        else:
-            fields = fields[:maxcols]
-        norm_rows.append(fields)
-
-    # build DataFrame
-    df = pd.DataFrame(norm_rows, columns=headers)
+    df = df.reindex(columns=range(maxcols), fill_value='')
+    df.columns = headers
 
     # combine first two positional columns into ROC date and propagate year when month-only rows appear
     if df.shape[1] >= 2:
-        y_series = df.iloc[:, 0].astype(str).fillna('').tolist()
-        m_series = df.iloc[:, 1].astype(str).fillna('').tolist()
-        combined = []
-        last_roc_year = None
-        for yv, mv in zip(y_series, m_series):
-            yv_s = yv.strip(); mv_s = mv.strip()
-            if re.search(r'\d{2,4}年?', yv_s):
-                last_roc_year = re.search(r'(\d{2,4})', yv_s).group(1)
-                roc = f"{last_roc_year}年{mv_s}月" if mv_s else f"{last_roc_year}年"
-            else:
-                if yv_s == '' and mv_s:
-                    if last_roc_year is None:
-                        roc = mv_s
-                    else:
-                        roc = f"{last_roc_year}年{mv_s}月" if not re.search(r'年', mv_s) else f"{last_roc_year}{mv_s}"
-                else:
-                    roc = (yv_s + mv_s).strip()
-            combined.append(roc)
-
-        def roc_to_yyyy_mm(s):
-            s = s.strip()
-            m = re.search(r'(\d{2,4})', s)
-            if not m:
-                return ''
-            # find month after the year match
-            rest = s[m.end():]
-            mm = re.search(r'(\d{1,2})', rest)
-            roc_y = int(m.group(1))
-            ad_y = roc_y + 1911
-            if mm:
-                month = int(mm.group(1))
-                return f"{ad_y:04d}-{month:02d}"
-            return f"{ad_y:04d}-01"
-
-        df.insert(0, '日期', [roc_to_yyyy_mm(x) for x in combined])
+        y_s = df.iloc[:, 0].astype(str).str.strip()
+        m_s = df.iloc[:, 1].astype(str).str.strip()
+        year_num = y_s.str.extract(_RE_YEAR_NUM, expand=False)
+        # a row with a year sets it for the month-only rows below it
+        roc_year = year_num.ffill()
+        has_year = year_num.notna()
+        month_only = y_s.eq('') & m_s.ne('')
+        carried = month_only & roc_year.notna() & ~m_s.str.contains('年', regex=False)
+        plain = has_year | carried
+
+        dates = pd.Series('', index=df.index, dtype=object)
+        if plain.any():
+            ad_year = roc_year[plain].astype(int) + 1911
+            month = m_s[plain].str.extract(_RE_MONTH_NUM, expand=False).fillna('1').astype(int)
+            dates[plain] = ad_year.map('{:04d}'.format) + '-' + month.map('{:02d}'.format)
+        # the few remaining rows (notes, odd labels) keep the scalar parse of their joined text
+        rest = ~plain
+        if rest.any():
+            text = (y_s + m_s).where(~month_only, m_s.where(roc_year.isna(), roc_year + m_s))
+            dates[rest] = [_roc_to_yyyy_mm(x) for x in text[rest]]
+
+        df.insert(0, '日期', dates)
         # drop the original first two positional columns
         cols_to_drop = list(df.columns[1:3])
         df = df.drop(columns=cols_to_drop)
 
-    # write to xlsx named 外銷訂單_YYYYMMDD(修正).xlsx where YYYYMMDD taken from pickle filename
+    # write to xlsx named 外銷訂單_YYYYMMDD(修正).xlsx where YYYYMMDD taken from the input filename
     bn = os.path.basename(pickle_path)
-    m = re.match(r'外銷訂單_(\d{8})\.pickle$', bn)
-    date_tag = m.group(1) if m else ''
+    if date_tag is None:
+        m = _RE_OUTPUT_NAME.match(bn)
+        date_tag = m.group(1) if m else ''
     out_name = f"外銷訂單_{date_tag}(修正).xlsx" if date_tag else f"{bn}(修正).xlsx"
     out_path = os.path.join(folder, out_name)
     # remove auto-generated duplicate-empty columns like '__dup2'
-    dup_cols = [c for c in df.columns if '__dup' in str(c) and df[c].replace('', pd.NA).isna().all()]
+    # cells are '' rather than NA here (the split pads with ''), so eq('') is enough and copies nothing
+    dup_cols = [c for c in df.columns if c in dup_headers and df[c].eq('').all()]
     if dup_cols:
         df = df.drop(columns=dup_cols)
 
     # write (overwrite allowed)
-    with pd.ExcelWriter(out_path, engine='openpyxl') as w:
-        df.to_excel(w, index=False)
+    write_xlsx(df, out_path)
 
 
 
@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import re
 import sys
 from pathlib import Path
@@ -6,6 +7,9 @@ import pandas as pd
 import zipfile
 import xml.etree.ElementTree as ET
 
+from aggregate_preprocessed import write_xlsx
+from preprocess_base import col_index, input_digest, openpyxl_row, output_is_current, record_digest
+
 """
 preprocess_moea.py
 - reads files named: 各縣市加油站汽柴油銷售分析表_YYYYMMDD.xlsx
@@ -18,6 +22,20 @@ preprocess_moea.py
 - write output as original base + '(修正).xlsx', overwrite if exists
 """
 
+# Clark-notation sheet tags, so the streaming parse compares tags without a namespace map
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+ROW_TAG = _MAIN_NS + 'row'
+C_TAG = _MAIN_NS + 'c'
+V_TAG = _MAIN_NS + 'v'
+IS_TAG = _MAIN_NS + 'is'
+T_TAG = _MAIN_NS + 't'
+# scraper downloads to convert, not the (修正) outputs written next to them
+_RE_INPUT_NAME = re.compile(r'^各縣市加油站汽柴油銷售分析表_(?!.*\(修正\)).*\.xlsx$')
+# bump when parse_moea_file changes, so unchanged inputs are converted again
+PARSED_VERSION = 1
+# first-column labels of the row that ends the table
+_RE_TOTAL = re.compile('合計|總計|合\u3000計')
+
 
 def roc_to_ad_year(roc_year_str: str) -> int:
     # convert ROC year like '114' to AD year 1911 + roc
@@ -44,14 +62,44 @@ def extract_roc_year_month(title: str):
     return None
 
 
+def read_sales_sheet(path: str, sheet_name: str = '銷售統計表') -> pd.DataFrame:
+    """Read sheet_name as text cells (None when empty) with openpyxl in read-only mode.
+
+    Rows are streamed and reading stops at the 合計 row that ends the table
+    (row5 onward, in the first column with a header), so the notes below it
+    are never loaded.
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in wb.sheetnames:
+            raise RuntimeError(f"sheet '{sheet_name}' not found in " + str(path))
+        rows = []
+        first_col = None
+        for i, r in enumerate(wb[sheet_name].iter_rows(values_only=True)):
+            row = openpyxl_row(r, as_str=True)
+            rows.append(row)
+            if i == 3:
+                first_col = next((j for j, h in enumerate(row) if h and h.strip()), None)
+            elif i > 3 and first_col is not None and first_col < len(row) and row[first_col] \
+                    and _RE_TOTAL.search(row[first_col]):
+                break
+    finally:
+        # release the underlying zipfile handle
+        wb.close()
+    # openpyxl reports the used range; drop trailing empty rows/columns like pandas does
+    width = max((j + 1 for row in rows for j, v in enumerate(row) if v not in (None, '')), default=0)
+    rows = [row[:width] + [None] * (width - len(row)) for row in rows]
+    while rows and all(v in (None, '') for v in rows[-1]):
+        rows.pop()
+    return pd.DataFrame(rows, dtype=object)
+
+
 def parse_moea_file(path: str) -> pd.DataFrame:
-    # read sheet '銷售統計表' using pandas; fallback to zip/xml parser if openpyxl unavailable
+    # read sheet '銷售統計表' with openpyxl; fallback to zip/xml parser if openpyxl unavailable
     df = None
     try:
-        xl = pd.ExcelFile(path)
-        if '銷售統計表' not in xl.sheet_names:
-            raise RuntimeError("sheet '銷售統計表' not found in " + str(path))
-        df = xl.parse('銷售統計表', header=None, dtype=str)
+        df = read_sales_sheet(path)
     except Exception as e:
         # try fallback zip/xml reader
         try:
@@ -70,56 +118,64 @@ def parse_moea_file(path: str) -> pd.DataFrame:
                     # find sheet target
                     wb = ET.fromstring(z.read('xl/workbook.xml'))
                     sheets = wb.find('main:sheets', ns)
+                    # relationship id -> part path, decompressed and parsed once
+                    rels = ET.fromstring(z.read('xl/_rels/workbook.xml.rels'))
+                    rel_map = {r.get('Id'): r.get('Target') for r in rels.findall('rel:Relationship', ns)}
                     target = None
                     for s in sheets.findall('main:sheet', ns):
-                        name = s.get('name')
-                        if name == sheet_name:
-                            rid = s.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id')
-                            rels = ET.fromstring(z.read('xl/_rels/workbook.xml.rels'))
-                            for r in rels.findall('rel:Relationship', ns):
-                                if r.get('Id') == rid:
-                                    target = r.get('Target')
-                                    break
+                        if s.get('name') == sheet_name:
+                            target = rel_map.get(s.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'))
                             break
                     if target is None:
                         raise RuntimeError(f"sheet {sheet_name} not found in archive")
-                    sheet_path = 'xl/' + target
-                    sheet_root = ET.fromstring(z.read(sheet_path))
-                    rows = sheet_root.findall('.//main:sheetData/main:row', ns)
-                    parsed = []
-                    maxcol = 0
-                    for row in rows:
-                        rowcells = {}
-                        for c in row.findall('main:c', ns):
-                            ref = c.get('r')
-                            m = re.match(r'([A-Za-z]+)(\d+)', ref)
-                            if not m:
+                    # targets are relative to xl/, or absolute ('/xl/worksheets/...') from some writers
+                    sheet_path = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+                    # column-wise: 0-based column -> its cell texts, one per row read so far
+                    cols = {}
+                    nrows = 0
+                    # stream the sheet and drop each row once read instead of building the whole tree
+                    with z.open(sheet_path) as f:
+                        for _, row in ET.iterparse(f, events=('end',)):
+                            if row.tag != ROW_TAG:
                                 continue
-                            colletters = m.group(1)
-                            idx = 0
-                            for ch in colletters:
-                                idx = idx*26 + (ord(ch.upper())-64)
-                            if idx > maxcol:
-                                maxcol = idx
-                            t = c.get('t')
-                            v = c.find('main:v', ns)
-                            if v is not None:
-                                if t == 's':
-                                    val = ss[int(v.text)] if int(v.text) < len(ss) else v.text
+                            for c in row.iter(C_TAG):
+                                ref = c.get('r') or ''
+                                # split 'AB12' at the first digit instead of a regex per cell
+                                j = 0
+                                while j < len(ref) and ref[j].isalpha():
+                                    j += 1
+                                if not j or j == len(ref) or not ref[j].isdigit():
+                                    continue
+                                idx = col_index(ref[:j])
+                                t = c.get('t')
+                                v = c.find(V_TAG)
+                                if v is not None:
+                                    if t == 's':
+                                        val = ss[int(v.text)] if int(v.text) < len(ss) else v.text
+                                    else:
+                                        val = v.text
                                 else:
-                                    val = v.text
-                            else:
-                                is_elem = c.find('main:is', ns)
-                                if is_elem is not None:
-                                    texts = [t.text if t.text is not None else '' for t in is_elem.findall('.//main:t', ns)]
-                                    val = ''.join(texts)
+                                    is_elem = c.find(IS_TAG)
+                                    if is_elem is not None:
+                                        texts = [t.text if t.text is not None else '' for t in is_elem.iter(T_TAG)]
+                                        val = ''.join(texts)
+                                    else:
+                                        val = ''
+                                col = cols.setdefault(idx - 1, [])
+                                if len(col) > nrows:
+                                    # same column twice in one row: the last cell wins
+                                    col[-1] = val
                                 else:
-                                    val = ''
-                            rowcells[idx-1] = val
-                        parsed.append([rowcells.get(i, '') for i in range(maxcol)])
-                    maxlen = max((len(r) for r in parsed), default=0)
-                    parsed = [r + ['']*(maxlen-len(r)) for r in parsed]
-                    return pd.DataFrame(parsed)
+                                    col.extend([''] * (nrows - len(col)))
+                                    col.append(val)
+                            nrows += 1
+                            row.clear()
+                    maxcol = max(cols) + 1 if cols else 0
+                    for i in range(maxcol):
+                        col = cols.setdefault(i, [])
+                        col.extend([''] * (nrows - len(col)))
+                    return pd.DataFrame({i: cols[i] for i in range(maxcol)}, index=range(nrows),
+                                        dtype='string', copy=False)
 
             df = xlsx_zip_parse_sheet(path, '銷售統計表')
         except Exception:
@@ -144,30 +200,24 @@ def parse_moea_file(path: str) -> pd.DataFrame:
 
     # header is row4 -> index 3
     header = df.iloc[3].fillna('').astype(str).tolist()
-    # data starts at row5 -> index 4
-    data = df.iloc[4:].copy()
-    data.columns = header
-
     # normalize header names: collapse whitespace and strip
-    newcols = [re.sub(r"\s+", " ", str(c)).strip() for c in data.columns]
-    data.columns = newcols
+    newcols = [re.sub(r"\s+", " ", str(c)).strip() for c in header]
+    # data starts at row5 -> index 4; no .copy(): every step below returns a new frame
+    data = df.iloc[4:].set_axis(newcols, axis=1)
     # drop columns with empty header name
     non_empty_cols = [c for c in data.columns if c != '' and c is not None]
-    data = data.loc[:, non_empty_cols].copy()
+    data = data.loc[:, non_empty_cols]
 
     # find end row: first row where first column contains 合計 or 總計
-    first_col = data.columns[0]
-    end_idx = None
-    for i, r in data.iterrows():
-        v = str(r[first_col]) if not pd.isna(r[first_col]) else ''
-        if '合計' in v or '總計' in v or '合　計' in v:
-            end_idx = i
-            break
-    if end_idx is not None:
-        data = data.loc[:end_idx]
-
-    # strip whitespace in all string cells and replace fullwidth spaces
-    data = data.applymap(lambda x: str(x).replace('\u3000', ' ').strip() if not pd.isna(x) else '')
+    is_total = data.iloc[:, 0].astype(str).str.contains(_RE_TOTAL, na=False)
+    hits = is_total.to_numpy().nonzero()[0]
+    if len(hits):
+        data = data.iloc[:hits[0] + 1]
+
+    # strip whitespace in all string cells and replace fullwidth spaces (column-wise, not per cell);
+    # the frame is converted to string dtype once here and stays that way below
+    data = data.fillna('').astype('string').apply(
+        lambda c: c.str.replace('\u3000', ' ', regex=False).str.strip())
 
     # insert 日期 column at front; fill with date_str
     data.insert(0, '日期', [date_str] * len(data))
@@ -176,30 +226,48 @@ def parse_moea_file(path: str) -> pd.DataFrame:
     if data.shape[1] > 1:
         county_col = data.columns[1]
         # remove all whitespace (spaces, fullwidth spaces, tabs) inside the field
-        data[county_col] = data[county_col].astype(str).str.replace(r"\s+", "", regex=True)
+        data[county_col] = data[county_col].str.replace(r"\s+", "", regex=True)
 
     return data
 
 
+def _one_file(src: Path):
+    """Convert one download into its (修正) xlsx; returns (status, src, out_path, error).
+
+    Top-level (and returning instead of printing) so process_folder can run it in a worker process.
+    """
+    out_path = src.with_name(src.stem + '(修正).xlsx')
+    try:
+        digest = input_digest(str(src), PARSED_VERSION)
+        if output_is_current(out_path, digest):
+            # same input as last time: the output on disk is already what we would write
+            return 'unchanged', src, out_path, None
+        df = parse_moea_file(str(src))
+        write_xlsx(df, str(out_path))
+        record_digest(out_path, digest)
+        return 'wrote', src, out_path, None
+    except Exception as e:
+        return 'failed', src, out_path, e
+
+
 def process_folder(folder: str, overwrite: bool = True):
     folder = Path(folder)
-    files = os.listdir(folder)
-    for f in files:
-        if f.startswith('各縣市加油站汽柴油銷售分析表_') and f.endswith('.xlsx') and '(修正)' not in f:
-            src = folder / f
-            base = os.path.splitext(f)[0]
-            out_name = base + '(修正).xlsx'
-            out_path = folder / out_name
-            try:
-                df = parse_moea_file(str(src))
-                df.to_excel(out_path, index=False)
-                print('wrote', out_path)
-                try:
-                    print(f'OUTPUT: {out_path}')
-                except Exception:
-                    print('OUTPUT: ' + str(out_path))
-            except Exception as e:
-                print('failed', src, e)
+    srcs = [folder / f for f in os.listdir(folder) if _RE_INPUT_NAME.match(f)]
+    # one file (the usual daily run) stays in-process; backfills spread the files over worker processes
+    if len(srcs) <= 1:
+        results = [_one_file(src) for src in srcs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(srcs))) as ex:
+            results = [fut.result() for fut in as_completed([ex.submit(_one_file, src) for src in srcs])]
+    for status, src, out_path, err in results:
+        if status == 'failed':
+            print('failed', src, err)
+            continue
+        print(status, out_path)
+        try:
+            print(f'OUTPUT: {out_path}')
+        except Exception:
+            print('OUTPUT: ' + str(out_path))
 
 
 if __name__ == '__main__':
@@ -1,11 +1,26 @@
+import math
 import os
 import re
 import zipfile
 import xml.etree.ElementTree as ET
 from typing import Optional
+from xml.sax.saxutils import escape
 
+import numpy as np
 import pandas as pd
 
+from preprocess_base import input_digest, openpyxl_row, output_is_current, record_digest
+
+# Clark-notation sheet tags, so the streaming parse compares tags without a namespace map
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+ROW_TAG = _MAIN_NS + 'row'
+C_TAG = _MAIN_NS + 'c'
+V_TAG = _MAIN_NS + 'v'
+# scraper downloads to convert, not the (修正) outputs written next to them
+_RE_INPUT_NAME = re.compile(r'^機械貨品別出口值_(?!.*\(修正\)).*\.xlsx$')
+# bump when parse_mof_machine_exports changes, so unchanged inputs are converted again
+PARSED_VERSION = 1
+
 
 def roc_to_ad_year(roc_year: int) -> int:
     return roc_year + 1911
@@ -60,15 +75,15 @@ def read_sheet_fallback_xlsx(path: str, sheet_name: str = None) -> pd.DataFrame:
             sheet_path = names[0]
 
         with z.open(sheet_path) as f:
-            tree = ET.parse(f)
-            root = tree.getroot()
-            ns = {'d': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
             rows = []
-            for row in root.findall('.//d:row', ns):
+            # stream the sheet and drop each row once read instead of building the whole tree
+            for _, row in ET.iterparse(f, events=('end',)):
+                if row.tag != ROW_TAG:
+                    continue
                 cells = []
-                for c in row.findall('d:c', ns):
+                for c in row.iter(C_TAG):
                     t = c.attrib.get('t')
-                    v = c.find('d:v', ns)
+                    v = c.find(V_TAG)
                     if v is None:
                         cells.append('')
                     else:
@@ -82,6 +97,7 @@ def read_sheet_fallback_xlsx(path: str, sheet_name: str = None) -> pd.DataFrame:
                         else:
                             cells.append(val)
                 rows.append(cells)
+                row.clear()
 
     maxc = max((len(r) for r in rows), default=0)
     rows = [r + [''] * (maxc - len(r)) for r in rows]
@@ -89,11 +105,22 @@ def read_sheet_fallback_xlsx(path: str, sheet_name: str = None) -> pd.DataFrame:
 
 
 def robust_read_sheet(path: str, sheet_name: str = 'Sheet1') -> pd.DataFrame:
+    # openpyxl read-only streaming instead of pd.read_excel; cells keep their types, like header=None
     try:
-        df = pd.read_excel(path, sheet_name=sheet_name, header=None)
-        return df
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = [openpyxl_row(r) for r in wb[sheet_name].iter_rows(values_only=True)]
+        finally:
+            wb.close()
     except Exception:
         return read_sheet_fallback_xlsx(path, sheet_name=sheet_name)
+    # openpyxl reports the used range; drop trailing empty rows/columns like pandas does
+    width = max((j + 1 for r in rows for j, v in enumerate(r) if v not in (None, '')), default=0)
+    rows = [r[:width] + [None] * (width - len(r)) for r in rows]
+    while rows and all(v in (None, '') for v in rows[-1]):
+        rows.pop()
+    return pd.DataFrame(rows)
 
 
 def roc_date_from_cell(x) -> Optional[str]:
@@ -120,24 +147,106 @@ def parse_mof_machine_exports(path: str) -> pd.DataFrame:
     for i in range(1, len(header_list)):
         if header_list[i].strip():
             header_list[i] = f"{header_list[i].strip()}(百萬美元)"
-    data = df.iloc[4:].copy()
-    data.columns = header_list
+    # no .copy(): set_axis already returns a new frame for the 日期 assignment below
+    data = df.iloc[4:].set_axis(header_list, axis=1)
     data['日期'] = data.iloc[:, 0].apply(roc_date_from_cell)
     data = data[data['日期'].notna()].reset_index(drop=True)
     return data
 
 
+# fixed parts of a one-sheet workbook for fast_write_xlsx; only sheet1.xml depends on the data
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+# characters XML 1.0 does not allow in text, even escaped
+_RE_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _col_letter(i: int) -> str:
+    # 0 -> A, 25 -> Z, 26 -> AA
+    s = ''
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        s = chr(65 + rem) + s
+    return s
+
+
+def _cell_xml(ref: str, v) -> str:
+    # empty string for missing values: the cell is simply left out
+    if isinstance(v, (bool, np.bool_)):
+        return f'<c r="{ref}" t="b"><v>{int(v)}</v></c>'
+    if isinstance(v, (int, np.integer)):
+        return f'<c r="{ref}"><v>{int(v)}</v></c>'
+    if isinstance(v, (float, np.floating)):
+        # NaN and inf have no xlsx representation
+        return f'<c r="{ref}"><v>{float(v)!r}</v></c>' if math.isfinite(v) else ''
+    if v is None or pd.isna(v):
+        return ''
+    text = escape(_RE_XML_ILLEGAL.sub('', str(v)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def fast_write_xlsx(df: pd.DataFrame, out_path: str) -> None:
+    """Write df (no index) as a one-sheet xlsx by emitting the sheet XML straight into the zip.
+
+    The output frame is just 日期 plus a few numeric columns, so no styles or
+    shared strings are needed; strings are written inline.
+    """
+    cols = [_col_letter(i) for i in range(df.shape[1])]
+    with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_DEFLATED) as z:
+        for name, xml in _XLSX_STATIC_PARTS.items():
+            z.writestr(name, xml)
+        with z.open('xl/worksheets/sheet1.xml', 'w') as f:
+            f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            header = ''.join(_cell_xml(f'{c}1', str(h)) for c, h in zip(cols, df.columns))
+            f.write(f'<row r="1">{header}</row>'.encode('utf-8'))
+            for r, row in enumerate(df.itertuples(index=False, name=None), start=2):
+                cells = ''.join(_cell_xml(f'{c}{r}', v) for c, v in zip(cols, row))
+                f.write(f'<row r="{r}">{cells}</row>'.encode('utf-8'))
+            f.write(b'</sheetData></worksheet>')
+
+
 def process_folder(folder: str, overwrite: bool = True):
     prefix = '機械貨品別出口值_'
     found = None
     for fn in os.listdir(folder):
-        if fn.startswith(prefix) and fn.endswith('.xlsx'):
+        if _RE_INPUT_NAME.match(fn):
             found = os.path.join(folder, fn)
             break
     if not found:
         print(f'no file found for {prefix} in {folder}')
         return
-    outdf = parse_mof_machine_exports(found)
     base = os.path.basename(found)
     name, ext = os.path.splitext(base)
     outname = f"{name}(修正){ext}"
@@ -145,8 +254,16 @@ def process_folder(folder: str, overwrite: bool = True):
     if os.path.exists(outpath) and not overwrite:
         print('skip existing', outpath)
         return
+    digest = input_digest(found, PARSED_VERSION)
+    if output_is_current(outpath, digest):
+        # same input as last time: the output on disk is already what we would write
+        print('unchanged', outpath)
+        print(f'OUTPUT: {outpath}')
+        return
+    outdf = parse_mof_machine_exports(found)
     try:
-        outdf.to_excel(outpath, index=False)
+        fast_write_xlsx(outdf, outpath)
+        record_digest(outpath, digest)
         print('wrote', outpath)
         try:
             print(f'OUTPUT: {outpath}')
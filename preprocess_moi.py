@@ -1,11 +1,15 @@
+from concurrent.futures import ProcessPoolExecutor
 import os
 import sys
 import re
 from pathlib import Path
 import pandas as pd
+from pandas.api.types import is_integer_dtype
 import zipfile
 import xml.etree.ElementTree as ET
 
+from preprocess_base import cell_to_str, col_index, openpyxl_row
+
 # preprocess_moi.py
 # usage: python preprocess_moi.py /path/to/YYYYMMDD
 
@@ -15,37 +19,33 @@ TARGET_FILES = [
     '8.5-核發建築物使用執照按用途別分'
 ]
 
-# mapping from Chinese month markers to month number
+# mapping from Chinese month markers to month number; keyed by the whole run of
+# numerals _RE_MONTH_CH extracts, so 十一/十二 are their own keys and runs like
+# 十三 or 二十 map to nothing
 CHINESE_MONTH_MAP = {
     '一':1, '二':2, '三':3, '四':4, '五':5, '六':6, '七':7, '八':8, '九':9, '十':10, '十一':11, '十二':12
 }
 
+# regexes compiled once; pandas .str calls get the .pattern string, which
+# keeps them on pandas' own (faster) path than passing a compiled object
+_RE_WS = re.compile(r'\s+')
+_RE_MONTH_CH = re.compile(r'([一二三四五六七八九十]{1,3})')
+_RE_YEAR_DIGITS = re.compile(r'(\d{3,4})')
+_RE_ENG_MONTH = re.compile(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)')
+# looser english month used by the 8.x parsers: the first capitalised 3-letter word
+_RE_ENG_MONTH_LOOSE = re.compile(r'([JFMASOND][a-z]{2})')
+_RE_ISO_YM = re.compile(r'^(\d{4})[\-/](\d{1,2})')
+_RE_FILE_DATE = re.compile(r'_(\d{6,8})')
+_RE_NUM_CLEAN = re.compile(r'[^0-9\-]')
+_RE_CELL_REF = re.compile(r'([A-Za-z]+)(\d+)')
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
 # helper: normalize whitespace and fullwidth spaces
 def norm(s):
     if s is None:
         return ''
-    return re.sub(r"\s+", " ", str(s)).strip()
-
-
-def chinese_month_to_num(s):
-    # expect strings like '一　月 Jan.' or '　一　月 Jan.' or '一月'
-    s = norm(s)
-    # extract the leading Chinese numerals
-    m = re.search(r'([一二三四五六七八九十]{1,3})', s)
-    if not m:
-        return None
-    key = m.group(1).replace(' ', '')
-    # normalize 十一/十二 etc
-    if key in CHINESE_MONTH_MAP:
-        return CHINESE_MONTH_MAP[key]
-    # handle cases like '十', '十一', '十二'
-    if key == '十':
-        return 10
-    if key == '十一':
-        return 11
-    if key == '十二':
-        return 12
-    return None
+    return _RE_WS.sub(" ", str(s)).strip()
 
 
 def is_year_total_row(cell_text):
@@ -53,7 +53,7 @@ def is_year_total_row(cell_text):
     if cell_text is None:
         return False
     s = str(cell_text)
-    if '年' in s and re.search(r'\d{3,4}', s):
+    if '年' in s and _RE_YEAR_DIGITS.search(s):
         return True
     # sometimes total rows contain '年度' or '總計'
     if '年度' in s or '總計' in s or '合計' in s:
@@ -61,6 +61,61 @@ def is_year_total_row(cell_text):
     return False
 
 
+ENGLISH_MONTH_MAP = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+                     'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+
+
+def filename_year(path) -> int:
+    # year of the _YYYYMMDD tag in the file name, 1900 when there is none
+    mfn = _RE_FILE_DATE.search(os.path.basename(path))
+    return int(mfn.group(1)[:4]) if mfn else 1900
+
+
+def _map_labels(labels: pd.Series, mapping: dict) -> pd.Series:
+    # a column holds a dozen distinct labels at most: map the categories, not every row
+    return labels.astype('category').map(mapping).astype(float)
+
+
+def month_row_dates(first: pd.Series, english_re: re.Pattern, fallback_year: int = None) -> pd.Series:
+    """Vectorized scan of a table's first column: 'YYYY-MM' for month rows, NA for every other row.
+
+    Same rules as the old per-row loops: a year-total row (see is_year_total_row)
+    sets the year for the month rows below it (ROC years get +1911) and is not a
+    month row itself; a month is read from the Chinese numerals, else from the
+    first english_re match; a row starting with YYYY-MM / YYYY/MM is taken
+    as is. Month rows before any year row use fallback_year, or are dropped
+    when it is None.
+    """
+    text = first[first.notna()].astype(str).str.replace(_RE_WS.pattern, ' ', regex=True).str.strip()
+    # blank spacer rows are neither year nor month rows: drop them before the regex passes
+    text = text[text.ne('')]
+    year = pd.to_numeric(text.str.extract(_RE_YEAR_DIGITS.pattern, expand=False), errors='coerce')
+    year_row = ((text.str.contains('年', regex=False) & year.notna())
+                | text.str.contains('年度|總計|合計'))
+    year = year.where(year >= 1900, year + 1911)
+    # carry each year row's year down to the month rows that follow it
+    current_year = year.where(year_row).ffill()
+    if fallback_year is not None:
+        current_year = current_year.fillna(fallback_year)
+
+    month = _map_labels(text.str.extract(_RE_MONTH_CH.pattern, expand=False), CHINESE_MONTH_MAP)
+    month = month.combine_first(_map_labels(text.str.extract(english_re.pattern, expand=False), ENGLISH_MONTH_MAP))
+    iso = text.str.extract(_RE_ISO_YM.pattern)
+
+    candidate = ~year_row
+    dated = candidate & month.notna() & current_year.notna()
+    iso_row = candidate & month.isna() & iso[0].notna()
+
+    dates = pd.Series(pd.NA, index=text.index, dtype=object)
+    if dated.any():
+        dates[dated] = (current_year[dated].astype(int).map('{:04d}'.format) + '-'
+                        + month[dated].astype(int).map('{:02d}'.format))
+    if iso_row.any():
+        dates[iso_row] = (iso.loc[iso_row, 0] + '-'
+                          + iso.loc[iso_row, 1].astype(int).map('{:02d}'.format))
+    return dates.reindex(first.index, fill_value=pd.NA)
+
+
 def parse_45(path: str) -> pd.DataFrame:
     """
     Parse '4.5-辦理建物所有權登記' xlsx.
@@ -138,7 +193,7 @@ def parse_45(path: str) -> pd.DataFrame:
         for h in headers:
             s = str(h)
             # normalize
-            s_norm = re.sub(r"\s+", " ", s).strip()
+            s_norm = _RE_WS.sub(" ", s).strip()
             # detect 所有權第一次登記 block
             if any(k in s_norm for k in ['所有權第一次登記', 'First Registration']):
                 # decide if this column is 棟數 or 面積
@@ -225,92 +280,25 @@ def parse_45(path: str) -> pd.DataFrame:
     # process rows: first column that contains month-like label is assumed headers[0]
     first_col = headers[0]
 
-    def to_ad_year(ystr: str):
-        # accept ROC like '105' or AD like '2016'
-        try:
-            y = int(re.search(r'(\d{3,4})', str(ystr)).group(1))
-        except Exception:
-            return None
-        if y < 1900:
-            return y + 1911
-        return y
-
-    out_rows = []
-    current_year = None
-    for _, r in data.iterrows():
-        cell0 = r[first_col]
-        t = norm(cell0)
-        if t == '':
-            # skip empty rows
-            continue
-        # if it's a year marker like '一○五年 2016' or contains '年' with digits
-        if is_year_total_row(t):
-            y = to_ad_year(t)
-            if y is not None:
-                current_year = y
-            # do not keep year-only rows
-            continue
-
-        # if it's a Chinese month like '　一　月 Jan.' or '二月'
-        mnum = chinese_month_to_num(t)
-        if mnum is not None:
-            if current_year is None:
-                # cannot determine year, skip this row
-                continue
-            date_str = f"{current_year:04d}-{int(mnum):02d}"
-            row_dict = {col: r.get(col, '') for col in headers}
-            row_dict[first_col] = date_str
-            out_rows.append(row_dict)
-            continue
-
-        # english month short like 'Jan' etc
-        m2 = re.search(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)', t)
-        if m2 is not None:
-            if current_year is None:
-                continue
-            mapp = {'Jan':1,'Feb':2,'Mar':3,'Apr':4,'May':5,'Jun':6,'Jul':7,'Aug':8,'Sep':9,'Oct':10,'Nov':11,'Dec':12}
-            mm = mapp.get(m2.group(1), None)
-            if mm is None:
-                continue
-            date_str = f"{current_year:04d}-{mm:02d}"
-            row_dict = {col: r.get(col, '') for col in headers}
-            row_dict[first_col] = date_str
-            out_rows.append(row_dict)
-            continue
-
-        # direct yyyy-mm like
-        m3 = re.match(r'(\d{4})[\-/](\d{1,2})', t)
-        if m3:
-            y = int(m3.group(1)); mm = int(m3.group(2))
-            date_str = f"{y:04d}-{mm:02d}"
-            row_dict = {col: r.get(col, '') for col in headers}
-            row_dict[first_col] = date_str
-            out_rows.append(row_dict)
-            continue
-
-        # otherwise skip rows that are not month rows
-        continue
-
-    if not out_rows:
+    dates = month_row_dates(data[first_col], _RE_ENG_MONTH)
+    keep = dates.notna()
+    if not keep.any():
         # return empty tidy frame with headers
         empty = pd.DataFrame(columns=['日期'] + headers[1:])
         return empty
 
-    out_df = pd.DataFrame(out_rows)
+    out_df = data.loc[keep].reset_index(drop=True)
+    out_df[first_col] = dates[keep].to_numpy()
     # ensure column order
     out_df = out_df.loc[:, headers]
     # rename first col to 日期
     out_df = out_df.rename(columns={headers[0]: '日期'})
-    # strip and clean
-    out_df = out_df.fillna('').astype(str).apply(lambda col: col.str.strip())
+    # no frame-wide strip: the numeric cleaning keeps only digits and '-' of
+    # each cell's text anyway, so only 日期 needs to become text
+    out_df['日期'] = out_df['日期'].astype(str)
 
     # try to coerce numeric columns
-    for col in out_df.columns:
-        if col == '日期':
-            continue
-        cleaned = out_df[col].astype(str).str.replace(r"[^0-9\-]", "", regex=True)
-        cleaned = cleaned.replace({'': pd.NA})
-        out_df[col] = pd.to_numeric(cleaned, errors='coerce').astype('Int64')
+    out_df = clean_numeric_columns(out_df)
 
     # map to canonical columns as requested by user
     desired = [
@@ -324,20 +312,20 @@ def parse_45(path: str) -> pd.DataFrame:
         '移轉登記_其他_棟數', '移轉登記_其他_面積(平方公尺)'
     ]
 
-    cols = list(out_df.columns)
+    # lowercase the column names once, not per lookup and pattern
+    cols = [(c, str(c).lower()) for c in out_df.columns]
 
     def find_col_for(patterns_any=None, patterns_all=None):
         # patterns_any: any of these tokens may appear; patterns_all: all must appear
-        for c in cols:
-            s = str(c)
-            ok_any = True
-            ok_all = True
-            if patterns_any:
-                ok_any = any(p.lower() in s.lower() for p in patterns_any)
-            if patterns_all:
-                ok_all = all(p.lower() in s.lower() for p in patterns_all)
-            if ok_any and ok_all:
-                return c
+        # first matching column wins, in column order
+        any_l = [p.lower() for p in patterns_any] if patterns_any else None
+        all_l = [p.lower() for p in patterns_all] if patterns_all else None
+        for c, s in cols:
+            if any_l and not any(p in s for p in any_l):
+                continue
+            if all_l and not all(p in s for p in all_l):
+                continue
+            return c
         return None
 
     lookup = {}
@@ -390,23 +378,11 @@ def parse_45(path: str) -> pd.DataFrame:
 
 def parse_85(path: str) -> pd.DataFrame:
     # Per user instruction, 8.5 should use the same parsing logic as 8.1 for the
-    # sheet '年月monthly(2018.02新修正格式update)'. Delegate to parse_81 which
-    # already implements the required behavior.
-    # parse_85 uses same logic as 8.1 but output columns must be prefixed for 使用執照
-    df = parse_81(path)
-    # normalize: if parse_81 already prefixed with '建造執照_', remove it so 8.5 uses only '使用執照_'
-    pref = df.copy()
-    newcols = []
-    for c in pref.columns:
-        if c == '日期':
-            newcols.append(c)
-        else:
-            s = str(c)
-            if s.startswith('建造執照_'):
-                s = s[len('建造執照_'):]
-            newcols.append('使用執照_' + s)
-    pref.columns = newcols
-    return pref
+    # sheet '年月monthly(2018.02新修正格式update)', with output columns prefixed
+    # for 使用執照 instead of 建造執照. The base frame is shared with parse_81, so
+    # building both from one workbook reads and parses the sheet only once.
+    df, _ = _parse_81_base(path)
+    return _prefix_columns(df, '使用執照_')
 
 
 def parse_multiheader_table(path: str, header_rows: int = 4) -> pd.DataFrame:
@@ -446,64 +422,16 @@ def parse_multiheader_table(path: str, header_rows: int = 4) -> pd.DataFrame:
     data.columns = headers
 
     first_col = headers[0]
-    out_rows = []
-    current_year = None
-    for _, r in data.iterrows():
-        cell0 = r[first_col]
-        if pd.isna(cell0):
-            continue
-        t = str(cell0).strip()
-        if t == '':
-            continue
-        if is_year_total_row(t):
-            m = re.search(r'(\d{3,4})', t)
-            if m:
-                y = int(m.group(1))
-                if y < 1900:
-                    y = y + 1911
-                current_year = y
-            continue
-        mnum = chinese_month_to_num(t)
-        if mnum is None:
-            m2 = re.search(r'([JFMASOND][a-z]{2})', t)
-            if m2:
-                mapp = {'Jan':1,'Feb':2,'Mar':3,'Apr':4,'May':5,'Jun':6,'Jul':7,'Aug':8,'Sep':9,'Oct':10,'Nov':11,'Dec':12}
-                key = m2.group(1)[:3]
-                mnum = mapp.get(key, None)
-        if mnum is None:
-            # sometimes the row starts with yyyy-mm already
-            m3 = re.match(r'(\d{4})[\-/](\d{1,2})', t)
-            if m3:
-                y = int(m3.group(1)); mm = int(m3.group(2))
-                date_str = f"{y:04d}-{mm:02d}"
-                row = r.copy()
-                row[first_col] = date_str
-                out_rows.append(row)
-                continue
-            # otherwise skip
-            continue
-        if current_year is None:
-            mfn = re.search(r'_(\d{6,8})', os.path.basename(path))
-            if mfn:
-                ymd = mfn.group(1)
-                year = int(ymd[:4])
-            else:
-                year = 1900
-        else:
-            year = current_year
-        mm = int(mnum)
-        date_str = f"{year:04d}-{mm:02d}"
-        row = r.copy()
-        row[first_col] = date_str
-        out_rows.append(row)
-
-    if not out_rows:
+    dates = month_row_dates(data[first_col], _RE_ENG_MONTH_LOOSE, fallback_year=filename_year(path))
+    keep = dates.notna()
+
+    if not keep.any():
         # fallback: return data with generated headers
         data.columns = headers
         return data
 
-    out_df = pd.DataFrame(out_rows)
-    out_df.columns = headers
+    out_df = data.loc[keep].copy()
+    out_df[first_col] = dates[keep]
     # drop empty cols
     tmp = out_df.replace({None: ''}).astype(str).apply(lambda col: col.str.strip())
     non_empty = [c for c in tmp.columns if not (tmp[c] == '').all()]
@@ -513,25 +441,22 @@ def parse_multiheader_table(path: str, header_rows: int = 4) -> pd.DataFrame:
         first = out_df.columns[0]
         out_df = out_df.rename(columns={first: '日期'})
     # normalize names
-    newcols = [re.sub(r"\s+", " ", str(c)).strip() for c in out_df.columns]
+    newcols = [_RE_WS.sub(" ", str(c)).strip() for c in out_df.columns]
     out_df.columns = newcols
 
-    # clean numeric columns
+    # clean numeric columns; as in parse_45 only 日期 needs to become text first
     tidy = out_df.copy()
-    # strip strings
-    tidy = tidy.fillna('').astype(str).apply(lambda col: col.str.strip())
-    for col in tidy.columns:
-        if col == '日期':
-            continue
-        cleaned = tidy[col].astype(str).str.replace(r"[^0-9\-]", "", regex=True)
-        cleaned = cleaned.replace('', pd.NA)
-        tidy[col] = pd.to_numeric(cleaned, errors='coerce').astype('Int64')
+    tidy['日期'] = tidy['日期'].astype(str)
+    tidy = clean_numeric_columns(tidy)
 
     return tidy
 
 
-def parse_81(path: str) -> pd.DataFrame:
-    """Parse 8.1 file using the sheet name requested by user.
+def _parse_81_base(path: str):
+    """Shared body of parse_81/parse_85: return (frame, tidy) with unprefixed columns.
+
+    tidy is False when the layout did not match and frame comes from
+    parse_multiheader_table as is.
     Rules: drop first row, combine next 4 rows into headers, then extract month rows from the remainder.
     """
     # try to read the named sheet first (user requested specific sheet name)
@@ -549,7 +474,7 @@ def parse_81(path: str) -> pd.DataFrame:
 
     if raw.shape[0] < 6:
         # fallback to generic parser
-        return parse_multiheader_table(path, header_rows=4)
+        return parse_multiheader_table(path, header_rows=4), False
 
     # drop the very first row (noise)
     raw2 = raw.iloc[1:].reset_index(drop=True)
@@ -577,70 +502,24 @@ def parse_81(path: str) -> pd.DataFrame:
     data = raw2.iloc[4:].copy()
     data.columns = headers
 
-    # extract month rows similar to parse_multiheader_table
+    # extract month rows, same rules as parse_multiheader_table
     first_col = headers[0]
-    out_rows = []
-    current_year = None
-    for _, r in data.iterrows():
-        cell0 = r[first_col]
-        if pd.isna(cell0):
-            continue
-        t = str(cell0).strip()
-        if t == '':
-            continue
-        if is_year_total_row(t):
-            m = re.search(r'(\d{3,4})', t)
-            if m:
-                y = int(m.group(1))
-                if y < 1900:
-                    y = y + 1911
-                current_year = y
-            continue
-        mnum = chinese_month_to_num(t)
-        if mnum is None:
-            m2 = re.search(r'([JFMASOND][a-z]{2})', t)
-            if m2:
-                mapp = {'Jan':1,'Feb':2,'Mar':3,'Apr':4,'May':5,'Jun':6,'Jul':7,'Aug':8,'Sep':9,'Oct':10,'Nov':11,'Dec':12}
-                key = m2.group(1)[:3]
-                mnum = mapp.get(key, None)
-        if mnum is None:
-            # sometimes yyyy-mm present
-            m3 = re.match(r'(\d{4})[\-/](\d{1,2})', t)
-            if m3:
-                y = int(m3.group(1)); mm = int(m3.group(2))
-                date_str = f"{y:04d}-{mm:02d}"
-                row = r.copy()
-                row[first_col] = date_str
-                out_rows.append(row)
-            continue
-        if current_year is None:
-            mfn = re.search(r'_(\d{6,8})', os.path.basename(path))
-            if mfn:
-                ymd = mfn.group(1)
-                year = int(ymd[:4])
-            else:
-                year = 1900
-        else:
-            year = current_year
-        mm = int(mnum)
-        date_str = f"{year:04d}-{mm:02d}"
-        row = r.copy()
-        row[first_col] = date_str
-        out_rows.append(row)
-
-    if not out_rows:
+    dates = month_row_dates(data[first_col], _RE_ENG_MONTH_LOOSE, fallback_year=filename_year(path))
+    keep = dates.notna()
+
+    if not keep.any():
         # fallback to generic
-        return parse_multiheader_table(path, header_rows=4)
+        return parse_multiheader_table(path, header_rows=4), False
 
-    df = pd.DataFrame(out_rows)
-    df.columns = headers
+    df = data.loc[keep].copy()
+    df[first_col] = dates[keep]
     tmp = df.replace({None: ''}).astype(str).apply(lambda col: col.str.strip())
     non_empty = [c for c in tmp.columns if not (tmp[c] == '').all()]
     df = df[non_empty].copy()
     if len(df.columns) > 0:
         first = df.columns[0]
         df = df.rename(columns={first: '日期'})
-    df.columns = [re.sub(r"\s+", " ", str(c)).strip() for c in df.columns]
+    df.columns = [_RE_WS.sub(" ", str(c)).strip() for c in df.columns]
 
     # mapping per user: build tidy with special residential naming
     cols = df.columns.tolist()
@@ -682,44 +561,62 @@ def parse_81(path: str) -> pd.DataFrame:
         else:
             tidy[tgt] = [''] * len(df)
 
-    tidy_df = pd.DataFrame(tidy)
-    for col in tidy_df.columns:
-        if col == '日期':
-            continue
-        cleaned = pd.Series(tidy_df[col]).astype(str).str.replace(r"[^0-9\-]", "", regex=True)
-        cleaned = cleaned.replace({'': pd.NA})
-        tidy_df[col] = pd.to_numeric(cleaned, errors='coerce').astype('Int64')
+    tidy_df = clean_numeric_columns(pd.DataFrame(tidy))
+    return tidy_df, True
+
+
+def _prefix_columns(df: pd.DataFrame, prefix: str) -> pd.DataFrame:
+    # prefix every output column except 日期
+    return df.set_axis([c if c == '日期' else prefix + str(c) for c in df.columns], axis=1)
+
+
+def parse_81(path: str) -> pd.DataFrame:
+    """Parse 8.1 file using the sheet name requested by user; columns get the 建造執照_ prefix."""
+    df, tidy = _parse_81_base(path)
+    if not tidy:
+        return df
+    return _prefix_columns(df, '建造執照_')
 
-    # add prefix for 8.1 output columns (except 日期)
-    prefixed = tidy_df.copy()
-    newcols = []
-    for c in prefixed.columns:
-        if c == '日期':
-            newcols.append(c)
-        else:
-            newcols.append('建造執照_' + str(c))
-    prefixed.columns = newcols
-    return prefixed
+
+def read_shared_strings(z: zipfile.ZipFile) -> list:
+    """sharedStrings.xml as a list, each <si>'s <t> runs joined; [] when the package has none.
+
+    Streamed with iterparse, clearing each <si> once read, instead of
+    building the whole tree first.
+    """
+    ss = []
+    if 'xl/sharedStrings.xml' not in z.namelist():
+        return ss
+    si_tag, t_tag = _MAIN_NS + 'si', _MAIN_NS + 't'
+    with z.open('xl/sharedStrings.xml') as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == si_tag:
+                ss.append(''.join(t.text or '' for t in elem.iter(t_tag)))
+                elem.clear()
+    return ss
 
 
 def read_sheet_by_name(path: str, sheet_name: str) -> pd.DataFrame:
     """Parse an xlsx package and return a DataFrame for the named sheet (header=None).
     Uses ElementTree to correctly handle sharedStrings rich text and namespaces.
     """
+    # python-calamine (Rust) returns dense rows from A1; the ElementTree walk below
+    # is kept for when it is not installed or cannot read the file
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        CalamineWorkbook = None
+    if CalamineWorkbook is not None:
+        try:
+            rows = CalamineWorkbook.from_path(path).get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+            maxc = max((len(r) for r in rows), default=0)
+            return pd.DataFrame([[cell_to_str(v) for v in r] + [''] * (maxc - len(r)) for r in rows])
+        except Exception:
+            pass
     ns = {'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
           'rel': 'http://schemas.openxmlformats.org/package/2006/relationships'}
     with zipfile.ZipFile(path) as z:
-        namelist = z.namelist()
-        # parse sharedStrings
-        ss = []
-        if 'xl/sharedStrings.xml' in namelist:
-            root = ET.fromstring(z.read('xl/sharedStrings.xml'))
-            for si in root.findall('main:si', ns):
-                texts = []
-                # collect all <t> under this si
-                for t in si.findall('.//main:t', ns):
-                    texts.append(t.text if t.text is not None else '')
-                ss.append(''.join(texts))
+        ss = read_shared_strings(z)
         # parse workbook and rels to map sheet name -> target
         wb = ET.fromstring(z.read('xl/workbook.xml'))
         sheets = wb.find('main:sheets', ns)
@@ -746,14 +643,10 @@ def read_sheet_by_name(path: str, sheet_name: str) -> pd.DataFrame:
             for c in row.findall('main:c', ns):
                 ref = c.get('r')
                 # column letters
-                m = re.match(r'([A-Za-z]+)(\d+)', ref)
+                m = _RE_CELL_REF.match(ref)
                 if not m:
                     continue
-                colletters = m.group(1)
-                # convert letters to index
-                idx = 0
-                for ch in colletters:
-                    idx = idx*26 + (ord(ch.upper())-64)
+                idx = col_index(m.group(1))
                 if idx > maxcol:
                     maxcol = idx
                 t = c.get('t')
@@ -780,48 +673,97 @@ def read_sheet_by_name(path: str, sheet_name: str) -> pd.DataFrame:
 
 
 def xlsx_zip_parse(path: str) -> pd.DataFrame:
-    import zipfile, re
-    z = zipfile.ZipFile(path)
-    ss = {}
-    if 'xl/sharedStrings.xml' in z.namelist():
-        s = z.read('xl/sharedStrings.xml').decode('utf-8')
-        texts = re.findall(r'<t[^>]*>(.*?)</t>', s, flags=re.S)
-        for i, t in enumerate(texts):
-            ss[i] = t
-    sheet = None
-    for n in z.namelist():
-        if n.startswith('xl/worksheets/sheet') and n.endswith('.xml'):
-            sheet = z.read(n).decode('utf-8')
-            break
-    if sheet is None:
-        raise RuntimeError('no sheet xml')
-    rows = []
-    row_matches = re.findall(r'<row[^>]*>(.*?)</row>', sheet, flags=re.S)
-    for rm in row_matches:
-        cells = re.findall(r'<c[^>]*>(.*?)</c>', rm, flags=re.S)
-        vals = []
-        for c in cells:
-            v = re.search(r'<v>(.*?)</v>', c, flags=re.S)
-            if v:
-                txt = v.group(1)
-                try:
-                    idx = int(txt)
-                    vals.append(ss.get(idx, txt))
-                except Exception:
+    """Last-resort reader: the first worksheet's cells in document order, as strings.
+
+    Streams sharedStrings and the sheet xml with iterparse, clearing each
+    <si>/<row> once read, so memory stays around one row.
+    """
+    main = _MAIN_NS
+    with zipfile.ZipFile(path) as z:
+        namelist = z.namelist()
+        ss = read_shared_strings(z)
+        sheet = next((n for n in namelist if n.startswith('xl/worksheets/sheet') and n.endswith('.xml')), None)
+        if sheet is None:
+            raise RuntimeError('no sheet xml')
+        rows = []
+        with z.open(sheet) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag != main + 'row':
+                    continue
+                vals = []
+                for c in elem.iterfind(main + 'c'):
+                    v = c.find(main + 'v')
+                    txt = v.text if v is not None and v.text is not None else ''
+                    if txt and c.get('t') == 's':
+                        try:
+                            txt = ss[int(txt)]
+                        except (ValueError, IndexError):
+                            pass
                     vals.append(txt)
-            else:
-                vals.append('')
-        rows.append(vals)
+                rows.append(vals)
+                elem.clear()
     return pd.DataFrame(rows)
 
 
+def clean_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce every column but 日期 to Int64 from the digits and '-' in each cell's text.
+
+    The text columns are scrubbed and parsed as one flat Series rather than one
+    regex pass per column; integer columns already are those digits and are
+    only cast.
+    """
+    cols = [c for c in df.columns if c != '日期']
+    scrub = []
+    for c in cols:
+        if is_integer_dtype(df[c]):
+            df[c] = df[c].astype('Int64')
+        else:
+            scrub.append(c)
+    if scrub:
+        n = len(df)
+        # column-major, so column j is the slice [j*n, (j+1)*n)
+        flat = pd.Series(df[scrub].astype(str).to_numpy(dtype=object).ravel(order='F'), dtype=str)
+        digits = flat.str.replace(_RE_NUM_CLEAN.pattern, '', regex=True).replace('', pd.NA)
+        nums = pd.to_numeric(digits, errors='coerce', dtype_backend='numpy_nullable').astype('Int64').array
+        for j, c in enumerate(scrub):
+            df[c] = nums[j * n:(j + 1) * n]
+    return df
+
+
+def read_first_sheet_readonly(path: str) -> pd.DataFrame:
+    """First sheet via openpyxl read_only/values_only, parsed like pd.read_excel(header=0).
+
+    Streams value tuples instead of building a Cell (with styles) per cell,
+    which is what pd.read_excel(engine='openpyxl') does.
+    """
+    import openpyxl
+    from pandas.io.parsers import TextParser
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        # empty cells as '' so the trailing-cell trim below can find them
+        rows = [openpyxl_row(r, empty='') for r in wb.worksheets[0].iter_rows(values_only=True)]
+    finally:
+        wb.close()
+    # drop trailing empty cells and rows like pandas does
+    for r in rows:
+        while r and r[-1] == '':
+            r.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    if not rows:
+        return pd.DataFrame()
+    width = max(len(r) for r in rows)
+    rows = [r + [''] * (width - len(r)) for r in rows]
+    return TextParser(rows, header=0).read()
+
+
 def robust_read_sheet(path: str) -> pd.DataFrame:
-    # try openpyxl first, then pandas, then zip/xml
+    # try openpyxl (read_only) first, then pandas (e.g. .xls), then zip/xml
     try:
-        return pd.read_excel(path, sheet_name=0)
+        return read_first_sheet_readonly(path)
     except Exception:
         try:
-            return pd.read_excel(path, sheet_name=0, engine='openpyxl')
+            return pd.read_excel(path, sheet_name=0)
         except Exception:
             # try zip/xml for xlsx
             try:
@@ -830,10 +772,32 @@ def robust_read_sheet(path: str) -> pd.DataFrame:
                 raise
 
 
+def _one_target(pref: str, src: Path, out_path: Path, overwrite: bool):
+    """Parse one target file and write its (修正) xlsx; returns (status, error).
+
+    Top-level (and returning instead of printing) so process_folder can run it in a worker process.
+    """
+    try:
+        if pref.startswith('4.5'):
+            df = parse_45(src)
+        elif pref.startswith('8.1'):
+            df = parse_81(src)
+        else:
+            df = parse_85(src)
+        # if file exists and overwrite is False, skip
+        if out_path.exists() and not overwrite:
+            return 'skipping', None
+        df.to_excel(out_path, index=False)
+        return 'wrote', None
+    except Exception as e:
+        return 'failed', e
+
+
 def process_folder(folder: str, overwrite: bool = False):
     folder = Path(folder)
     files = os.listdir(folder)
     results = {}
+    jobs = []
     for pref in TARGET_FILES:
         candidates = [f for f in files if f.startswith(pref) and f.lower().endswith(('.xls', '.xlsx'))]
         if not candidates:
@@ -852,29 +816,28 @@ def process_folder(folder: str, overwrite: bool = False):
         if base.endswith('(修正)'):
             base = base[: -len('(修正)')]
         out_name = f"{base}(修正).xlsx"
-        out_path = folder / out_name
-        try:
-            if pref.startswith('4.5'):
-                df = parse_45(src)
-            elif pref.startswith('8.1'):
-                df = parse_81(src)
-            else:
-                df = parse_85(src)
-            # if file exists and overwrite is False, skip
-            if out_path.exists() and not overwrite:
-                print('skipping (exists):', out_path)
-                results[str(src)] = str(out_path)
-            else:
-                df.to_excel(out_path, index=False)
-                print('wrote', out_path)
-                try:
-                    print(f'OUTPUT: {out_path}')
-                except Exception:
-                    print('OUTPUT: ' + str(out_path))
-                results[str(src)] = str(out_path)
-        except Exception as e:
-            print('failed processing', src, e)
+        jobs.append((pref, src, folder / out_name))
+
+    # the target files are independent: parse them in worker processes, report in TARGET_FILES order
+    if len(jobs) <= 1:
+        outcomes = [_one_target(pref, src, out_path, overwrite) for pref, src, out_path in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(jobs))) as ex:
+            outcomes = list(ex.map(_one_target, *zip(*jobs), [overwrite] * len(jobs)))
+    for (pref, src, out_path), (status, err) in zip(jobs, outcomes):
+        if status == 'failed':
+            print('failed processing', src, err)
             results[str(src)] = None
+        elif status == 'skipping':
+            print('skipping (exists):', out_path)
+            results[str(src)] = str(out_path)
+        else:
+            print('wrote', out_path)
+            try:
+                print(f'OUTPUT: {out_path}')
+            except Exception:
+                print('OUTPUT: ' + str(out_path))
+            results[str(src)] = str(out_path)
     return results
 
 
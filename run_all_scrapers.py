@@ -1,8 +1,11 @@
 import os
 import json
+import inspect
 from datetime import datetime
 import traceback
 
+from scraper_base import SharedBrowser, SharedAsyncBrowser
+
 # list of scraper modules and a friendly name
 SCRAPERS = [
     ("motc_scraper", "交通部"),
@@ -29,6 +32,13 @@ def ensure_logs_dir():
     return d
 
 
+def accepts_shared_context(mod):
+    try:
+        return 'context' in inspect.signature(mod.run).parameters
+    except (TypeError, ValueError):
+        return False
+
+
 def run_all(output_dir='.', keep_browser_open=False, dry_run=False):
     """Run all scrapers in SCRAPERS. dry_run=True will only import modules and report availability.
     Logs a summary JSON to ./logs/YYYYMMDD_runlog.json"""
@@ -41,6 +51,19 @@ def run_all(output_dir='.', keep_browser_open=False, dry_run=False):
         'results': []
     }
 
+    # at most one of the two shared browsers is running at any time
+    shared = SharedBrowser(headless=not keep_browser_open)
+    # the scrapers run one at a time, so they can share one persistent profile
+    shared_async = SharedAsyncBrowser(headless=not keep_browser_open, profile='run_all_scrapers')
+    try:
+        _run_scrapers(summary, shared, shared_async, output_dir, keep_browser_open, dry_run, date_tag, log_path)
+    finally:
+        shared.close()
+        shared_async.close()
+    return summary
+
+
+def _run_scrapers(summary, shared, shared_async, output_dir, keep_browser_open, dry_run, date_tag, log_path):
     for mod_name, friendly in SCRAPERS:
         entry = {'module': mod_name, 'friendly': friendly, 'status': 'not-started', 'error': None, 'elapsed_seconds': None, 'files': []}
         try:
@@ -64,7 +87,22 @@ def run_all(output_dir='.', keep_browser_open=False, dry_run=False):
                         start = _time.time()
                         # allow per-module override for headful mode
                         module_keep_open = HEADFUL_OVERRIDES.get(mod_name, keep_browser_open)
-                        mod.run(output_dir=output_dir, keep_browser_open=module_keep_open)
+                        if mod_name not in HEADFUL_OVERRIDES and hasattr(mod, 'run_async'):
+                            # async scraper: reuse the async browser, it opens its own context
+                            shared.close()
+                            shared_async.run(mod.run_async, output_dir)
+                        elif mod_name not in HEADFUL_OVERRIDES and accepts_shared_context(mod):
+                            # reuse the already running browser; only a fresh context per scraper
+                            shared_async.close()
+                            ctx = shared.new_context()
+                            try:
+                                mod.run(output_dir=output_dir, keep_browser_open=module_keep_open, context=ctx)
+                            finally:
+                                ctx.close()
+                        else:
+                            shared.close()
+                            shared_async.close()
+                            mod.run(output_dir=output_dir, keep_browser_open=module_keep_open)
                         end = _time.time()
                         entry['elapsed_seconds'] = round(end - start, 2)
 
@@ -93,8 +131,6 @@ def run_all(output_dir='.', keep_browser_open=False, dry_run=False):
         with open(log_path, 'w', encoding='utf-8') as f:
             json.dump(summary, f, ensure_ascii=False, indent=2)
 
-    return summary
-
 
 if __name__ == '__main__':
     import argparse
@@ -0,0 +1,323 @@
+"""
+scraper_base.py
+
+Shared Playwright browser handling for the scrapers, so a batch run starts
+Chromium once instead of once per scraper:
+
+- SharedBrowser: lazily started sync browser, hands out contexts to scrapers
+  whose run() accepts context= (dgbas, ee520).
+- SharedAsyncBrowser: the same for scrapers exposing run_async(browser, ...)
+  (moea, mof, moi, mol_*, motc, ndc), driven from synchronous code on a
+  private event loop.
+- shared_browser() / shared_async_browser(): context-manager forms of the above.
+- RunContext: per-run date tag and output folder.
+- PROFILE_ROOT: persistent Chromium profiles (HTTP/JS caches, cookies) that the
+  async browsers can be started on, so repeat runs do not start cold.
+- asset_blocker() / async_asset_blocker(): route handlers aborting unneeded resources.
+- backoff_delay(): jittered wait between retries.
+- scrape_in_new_context(), save_download(), run_standalone(): the context setup,
+  download naming and standalone entry point every async scraper used to repeat.
+  make_run_async() builds a scraper's run_async() from its _do_work().
+  move_download() does the rename-instead-of-copy save for sync downloads.
+- click_and_download(): one click on a download trigger, saved via save_download().
+
+Only one of the two may be running at a time in a thread: sync Playwright
+refuses to start while another Playwright instance drives the thread.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import urlparse
+
+# default element/frame wait. Playwright timeouts take milliseconds, time.time()
+# deadlines take seconds; keep both spelled out so the units cannot be mixed up
+DEFAULT_WAIT_S = 60
+DEFAULT_WAIT_MS = DEFAULT_WAIT_S * 1000
+# resource types a scrape never needs; aborting them speeds up page loads. Scrapers
+# whose portal does need one of them define their own BLOCKED_RESOURCE_TYPES
+BLOCKED_RESOURCE_TYPES = ('image', 'font', 'stylesheet', 'media')
+# analytics/tag hosts the portals embed; none of them is needed for a scrape
+BLOCKED_HOSTS = ('google-analytics.com', 'googletagmanager.com', 'doubleclick.net')
+# one sub-folder per profile name; the portals ship large, rarely changing scripts,
+# so a kept profile's HTTP and compiled-code caches make later page loads much cheaper
+PROFILE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.pw-profile')
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """Date tag and dated output folder, fixed once at the start of a scraper run.
+
+    Deriving them once keeps every file of a run in the same folder even if the
+    date rolls over mid-run.
+    """
+    date_tag: str
+    out_folder: str
+
+    @classmethod
+    def create(cls, output_dir='.', reuse_dated_dir=False):
+        """Build the context and create out_folder (output_dir/YYYYMMDD).
+
+        With reuse_dated_dir=True an output_dir that already is the YYYYMMDD folder
+        is used as is.
+        """
+        date_tag = datetime.now().strftime('%Y%m%d')
+        if reuse_dated_dir and os.path.basename(os.path.abspath(output_dir)) == date_tag:
+            out_folder = output_dir
+        else:
+            out_folder = os.path.join(output_dir, date_tag)
+        os.makedirs(out_folder, exist_ok=True)
+        return cls(date_tag, out_folder)
+
+
+class SharedBrowser:
+    """One sync Playwright/Chromium instance shared by scrapers whose run() accepts context=.
+
+    Started lazily on first use. It must be closed before running a scraper that
+    starts its own sync_playwright(), since two sync Playwright instances cannot
+    be active in the same thread.
+    """
+
+    def __init__(self, headless=True):
+        self.headless = headless
+        self._pw = None
+        self._browser = None
+
+    def new_context(self):
+        if self._browser is None:
+            from playwright.sync_api import sync_playwright
+            self._pw = sync_playwright().start()
+            try:
+                self._browser = self._pw.chromium.launch(headless=self.headless)
+            except Exception:
+                self.close()
+                raise
+        return self._browser.new_context(accept_downloads=True)
+
+    def close(self):
+        # also reached when launch() raised after Playwright started: stop it all the same
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+        if self._pw is not None:
+            self._pw.stop()
+        self._pw = None
+        self._browser = None
+
+
+async def _launch_async(p, headless, profile=None):
+    """Launch Chromium, on the persistent profile PROFILE_ROOT/profile when one is named.
+
+    With a profile the result is a BrowserContext rather than a Browser; the
+    scrapers' run_async() accept either (see scrape_in_new_context). Chromium
+    locks a profile while it is open, so if another run still holds it a
+    throwaway browser is started instead.
+    """
+    if profile:
+        try:
+            return await p.chromium.launch_persistent_context(
+                os.path.join(PROFILE_ROOT, profile), headless=headless, accept_downloads=True)
+        except Exception:
+            logging.getLogger(__name__).warning('profile %s unavailable (in use?), starting without it', profile)
+    return await p.chromium.launch(headless=headless)
+
+
+class SharedAsyncBrowser:
+    """One async Playwright/Chromium instance kept alive between run_async() calls.
+
+    The browser lives on a private event loop so synchronous callers such as
+    run_all_scrapers can run one scraper after another on the same process.
+    With profile set it runs on that persistent profile (see _launch_async).
+    """
+
+    def __init__(self, headless=True, profile=None):
+        self.headless = headless
+        self.profile = profile
+        self._loop = None
+        self._pw = None
+        self._browser = None
+
+    def run(self, scrape, *args, **kwargs):
+        """Run scrape(browser, *args, **kwargs) (a coroutine function) to completion."""
+        if self._browser is None:
+            from playwright.async_api import async_playwright
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._pw = self._loop.run_until_complete(async_playwright().start())
+                self._browser = self._loop.run_until_complete(_launch_async(self._pw, self.headless, self.profile))
+            except Exception:
+                self.close()
+                raise
+        return self._loop.run_until_complete(scrape(self._browser, *args, **kwargs))
+
+    def close(self):
+        # also reached when the start or launch failed part-way: stop what did start
+        if self._browser is not None:
+            try:
+                self._loop.run_until_complete(self._browser.close())
+            except Exception:
+                pass
+        if self._pw is not None:
+            self._loop.run_until_complete(self._pw.stop())
+        if self._loop is not None:
+            self._loop.close()
+        self._loop = None
+        self._pw = None
+        self._browser = None
+
+
+@contextmanager
+def shared_browser(headless=True):
+    """Yield a SharedBrowser and close it (if it was ever started) on exit."""
+    shared = SharedBrowser(headless=headless)
+    try:
+        yield shared
+    finally:
+        shared.close()
+
+
+@asynccontextmanager
+async def shared_async_browser(headless=True, profile=None):
+    """Launch one Chromium for the duration of the block and yield the Browser.
+
+    With profile set, yield a persistent BrowserContext instead (see _launch_async).
+    """
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser = await _launch_async(p, headless, profile)
+        try:
+            yield browser
+        finally:
+            await browser.close()
+
+
+def _is_blocked(request, resource_types):
+    if request.resource_type in resource_types:
+        return True
+    host = urlparse(request.url).hostname or ''
+    return any(host == h or host.endswith('.' + h) for h in BLOCKED_HOSTS)
+
+
+def asset_blocker(resource_types):
+    """Return a sync route handler aborting requests of the given resource types and to BLOCKED_HOSTS."""
+    def block_assets(route):
+        if _is_blocked(route.request, resource_types):
+            route.abort()
+        else:
+            route.continue_()
+    return block_assets
+
+
+def async_asset_blocker(resource_types):
+    """Async counterpart of asset_blocker(), for contexts of an async browser."""
+    async def block_assets(route):
+        if _is_blocked(route.request, resource_types):
+            await route.abort()
+        else:
+            await route.continue_()
+    return block_assets
+
+
+def backoff_delay(attempt, base=0.25, cap=8.0):
+    """Seconds to wait before retry number attempt + 1: uniform in [0, min(cap, base * 2**attempt)].
+
+    Full jitter keeps scrapers that failed together against the same host from
+    retrying in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def move_download(download, path):
+    """Sync counterpart of save_download()'s saving step: rename the temp file to path, else save_as()."""
+    try:
+        os.replace(download.path(), path)
+    except Exception:
+        download.save_as(path)
+    return path
+
+
+async def save_download(download, run_ctx, prefix, default_ext=''):
+    """Save a Download as out_folder/<prefix>_<date_tag><ext> and return the path.
+
+    ext comes from the server's suggested file name, default_ext when it has none.
+    The finished temp file is renamed into place rather than copied; save_as()
+    is only used when that is not possible (temp dir on another filesystem, or a
+    remote browser whose files are not local).
+    """
+    _, ext = os.path.splitext(download.suggested_filename or '')
+    path = os.path.join(run_ctx.out_folder, f'{prefix}_{run_ctx.date_tag}{ext or default_ext}')
+    try:
+        # path() waits for the download to finish
+        os.replace(await download.path(), path)
+    except Exception:
+        await download.save_as(path)
+    return path
+
+
+async def click_and_download(page, selector, run_ctx, prefix):
+    """Click the first element matching selector and save the download it starts (see save_download).
+
+    There is no retry: a second click while the first download is still being
+    generated would queue a duplicate, so it waits once, with a realistic timeout.
+    """
+    el = page.locator(selector).first
+    # auto-waits for the element; raises if it never shows up
+    await el.scroll_into_view_if_needed(timeout=30000)
+    async with page.expect_download(timeout=60000) as dl:
+        await el.click()
+    download = await dl.value
+    return await save_download(download, run_ctx, prefix)
+
+
+async def scrape_in_new_context(browser, do_work, run_ctx, blocked_types=()):
+    """Run do_work(page, run_ctx) in a fresh downloads-enabled context of browser.
+
+    Requests of blocked_types are aborted for every page of the context; the
+    context is closed afterwards whether or not do_work raised. browser may also
+    be a persistent profile context (see _launch_async): then it is reused, and
+    only the page and the route are removed again.
+    """
+    owned = hasattr(browser, 'new_context')
+    context = await browser.new_context(accept_downloads=True) if owned else browser
+    block_assets = async_asset_blocker(blocked_types) if blocked_types else None
+    if block_assets:
+        await context.route('**/*', block_assets)
+    page = None
+    try:
+        page = await context.new_page()
+        return await do_work(page, run_ctx)
+    finally:
+        if owned:
+            await context.close()
+        else:
+            if block_assets:
+                await context.unroute('**/*', block_assets)
+            if page is not None:
+                await page.close()
+
+
+def make_run_async(do_work, blocked_types=BLOCKED_RESOURCE_TYPES, reuse_dated_dir=False):
+    """Build a scraper's run_async(browser, output_dir) from its do_work(page, run_ctx).
+
+    run_async scrapes using a browser owned by the caller (see orchestrator.py):
+    it creates the RunContext (see RunContext.create for reuse_dated_dir) and runs
+    do_work in a new context of browser (see scrape_in_new_context).
+    """
+    async def run_async(browser, output_dir='.'):
+        run_ctx = RunContext.create(output_dir, reuse_dated_dir=reuse_dated_dir)
+        await scrape_in_new_context(browser, do_work, run_ctx, blocked_types)
+    return run_async
+
+
+def run_standalone(run_async, output_dir='.', headless=True, profile=None):
+    """Run a scraper's run_async(browser, output_dir) on a browser of its own (its sync run())."""
+    async def _main():
+        async with shared_async_browser(headless=headless, profile=profile) as browser:
+            await run_async(browser, output_dir)
+    asyncio.run(_main())